@@ -1,19 +1,26 @@
 import numpy as np
-import pandas as pd
 
-def compute_bias_severity(model, X_test, y_test, feature):
-    df = X_test.copy()
-    df["true"] = y_test.values
-    df["group"] = pd.qcut(df[feature], 3, labels=["Low", "Medium", "High"])
+from analysis.inference import group_accuracies, labels_from_proba
+from analysis.subgroup_risk import GROUP_LABELS, MIN_GROUP_SIZE, subgroup_codes
 
-    overall_acc = np.mean(model.predict(X_test) == y_test)
-    subgroup_drops = []
 
-    for g in ["Low", "Medium", "High"]:
-        sub = df[df["group"] == g]
-        if len(sub) < 10:
-            continue
-        acc = np.mean(model.predict(sub.drop(columns=["true", "group"])) == sub["true"])
-        subgroup_drops.append(overall_acc - acc)
+def compute_bias_severity(model, X_test, y_test, feature, proba=None):
+    # Reuse the shared inference pass when the caller has one
+    if proba is None:
+        proba = model.predict_proba(X_test)
+
+    y_true = np.asarray(y_test)
+    correct = labels_from_proba(model, proba) == y_true
+    codes = subgroup_codes(X_test, feature)
+    valid = codes >= 0
+
+    overall_acc = np.mean(correct)
+    acc, sizes = group_accuracies(correct[valid], codes[valid], len(GROUP_LABELS))
+
+    subgroup_drops = [
+        overall_acc - acc[g]
+        for g in range(len(GROUP_LABELS))
+        if sizes[g] >= MIN_GROUP_SIZE
+    ]
 
     return max(subgroup_drops)
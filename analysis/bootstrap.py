@@ -0,0 +1,123 @@
+import numpy as np
+
+from analysis.risk_pipeline import RISK_WEIGHTS
+from analysis.subgroup_scan import MIN_GROUP_SIZE
+
+DEFAULT_N_BOOT = 2000
+
+# Working memory of one batch of replicates. Each (replicate, row) cell
+# costs the int64 index, offset and bincount arrays plus the float64
+# count matrix.
+BOOTSTRAP_MEMORY_BYTES = 256 * 1024 * 1024
+BYTES_PER_CELL = 32
+
+
+def bootstrap_batch_size(n_rows, memory_budget=BOOTSTRAP_MEMORY_BYTES):
+    """
+    Replicates per batch that keep a batch within memory_budget.
+    """
+    return max(1, memory_budget // (max(n_rows, 1) * BYTES_PER_CELL))
+
+
+def resample_counts(rng, n_rows, n_boot):
+    """
+    (n_boot, n_rows) matrix of how often each row appears in each
+    bootstrap replicate, built from a resampled-index matrix.
+    """
+    idx = rng.integers(0, n_rows, size=(n_boot, n_rows))
+    flat = idx + (np.arange(n_boot) * n_rows)[:, np.newaxis]
+    return np.bincount(flat.ravel(), minlength=n_boot * n_rows).reshape(
+        n_boot, n_rows).astype(np.float64)
+
+
+def _replicate_components(counts, per_row, onehot, correct_v1, correct_v2):
+    """
+    Every component for a batch of replicates as matrix products of
+    the count matrix with per-row vectors (no re-prediction).
+    """
+    n_rows = counts.shape[1]
+
+    flip_rate = counts @ per_row["flip"] / n_rows
+    conf_shift = counts @ per_row["abs_diff"] / n_rows
+
+    sizes = counts @ onehot
+    hits_v1 = counts @ (onehot * correct_v1[:, np.newaxis])
+    hits_v2 = counts @ (onehot * correct_v2[:, np.newaxis])
+    eligible = sizes >= MIN_GROUP_SIZE
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        acc_v1 = hits_v1 / sizes
+        acc_v2 = hits_v2 / sizes
+    overall_acc_v2 = counts @ correct_v2 / n_rows
+
+    drops = np.where(eligible, acc_v1 - acc_v2, -np.inf)
+    subgroup_risk = np.maximum(0.0, drops.max(axis=1))
+
+    gaps = np.where(eligible, overall_acc_v2[:, np.newaxis] - acc_v2, -np.inf)
+    bias_severity = gaps.max(axis=1)
+    bias_severity[~eligible.any(axis=1)] = np.nan
+
+    return {
+        "flip_rate": flip_rate,
+        "conf_shift": conf_shift,
+        "subgroup_risk": subgroup_risk,
+        "bias_severity": bias_severity,
+    }
+
+
+def bootstrap_risk(inference, y_true, codes, feature_drift, n_boot=DEFAULT_N_BOOT,
+                   confidence=0.95, random_state=0, batch_size=None):
+    """
+    Percentile bootstrap intervals for the risk components and the
+    weighted final score, from one cached inference pass.
+
+    Replicates resample rows with replacement; each batch is a
+    resampled-index matrix turned into row counts, and every
+    component is a batched reduction over it. Subgroup bins stay
+    fixed at the full-sample terciles (codes). SHAP drift enters
+    the final score as its point estimate, since only per-feature
+    SHAP sums are cached. batch_size defaults to
+    bootstrap_batch_size(n_rows); it only bounds memory, the
+    replicates drawn do not depend on it.
+
+    Returns {component: {"low", "high", "std"}} including
+    "final_risk_score".
+    """
+    y_true = np.asarray(y_true)
+    n_rows = len(y_true)
+    rng = np.random.default_rng(random_state)
+    batch_size = batch_size or bootstrap_batch_size(n_rows)
+
+    per_row = {
+        "flip": (inference["pred_v1"] != inference["pred_v2"]).astype(np.float64),
+        "abs_diff": np.abs(inference["proba_v1"] - inference["proba_v2"]).mean(axis=1),
+    }
+    correct_v1 = (inference["pred_v1"] == y_true).astype(np.float64)
+    correct_v2 = (inference["pred_v2"] == y_true).astype(np.float64)
+
+    n_groups = max(int(codes.max()) + 1, 1)
+    onehot = np.zeros((n_rows, n_groups))
+    valid = codes >= 0
+    onehot[np.flatnonzero(valid), codes[valid]] = 1.0
+
+    replicates = {name: [] for name in (*RISK_WEIGHTS, "final_risk_score")}
+    for start in range(0, n_boot, batch_size):
+        counts = resample_counts(rng, n_rows, min(batch_size, n_boot - start))
+        comps = _replicate_components(counts, per_row, onehot, correct_v1, correct_v2)
+        comps["feature_drift"] = np.full(len(counts), float(feature_drift))
+        score = sum(w * comps[name] for name, w in RISK_WEIGHTS.items())
+        for name in RISK_WEIGHTS:
+            replicates[name].append(comps[name])
+        replicates["final_risk_score"].append(score)
+
+    alpha = (1 - confidence) / 2
+    intervals = {}
+    for name, parts in replicates.items():
+        values = np.concatenate(parts)
+        low, high = np.nanquantile(values, [alpha, 1 - alpha])
+        intervals[name] = {
+            "low": float(low),
+            "high": float(high),
+            "std": float(np.nanstd(values)),
+        }
+    return intervals
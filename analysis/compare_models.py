@@ -1,8 +1,10 @@
 import joblib
 import numpy as np
 
+from analysis.dataset_store import load_features
+
 # Load test data
-X_test = joblib.load("data/X_test.pkl")
+X_test = load_features("data/test")
 
 # Load models
 model_v1 = joblib.load("models/model_v1.pkl")
@@ -1,40 +1,79 @@
-import shap
 import numpy as np
-import pandas as pd
 
-def compute_metrics(model_v1, model_v2, X_test):
-    if not isinstance(X_test, pd.DataFrame):
-        X_test = pd.DataFrame(X_test, columns=model_v1.feature_names_in_)
+from analysis.inference import ensure_frame, run_inference
+from analysis.drift import (
+    DEFAULT_DRIFT_TOL,
+    approximate_shap_drift,
+    drift_from_sums,
+    exact_shap_drift,
+)
 
-    # Prediction flip rate
-    flip_rate = np.mean(
-        model_v1.predict(X_test) != model_v2.predict(X_test)
+
+def prediction_flip_rate(inference):
+    return np.mean(inference["pred_v1"] != inference["pred_v2"])
+
+
+def confidence_shift(inference):
+    return np.mean(
+        np.abs(inference["proba_v1"] - inference["proba_v2"])
     )
 
-    # Confidence shift
-    conf_shift = np.mean(
-        np.abs(
-            model_v1.predict_proba(X_test) -
-            model_v2.predict_proba(X_test)
+
+def feature_drift(model_v1, model_v2, X_test, mode="exact",
+                  tol=DEFAULT_DRIFT_TOL, strata=None, n_jobs=1,
+                  shap_sums=None, checkpoint=None):
+    """
+    SHAP feature drift as a dict with the estimate, its interval
+    and the rows used. `mode` is "exact" (all rows) or
+    "approximate" (adaptive stratified sample, see analysis/drift.py).
+    n_jobs > 1 runs exact SHAP chunks on a process pool. In exact
+    mode, precomputed per-feature |SHAP| sums for both models
+    (e.g. from analysis/summary_cache.py) can be passed as shap_sums.
+    `checkpoint` runs between SHAP chunks (analysis/instrumentation.py).
+    """
+    if mode == "exact":
+        if shap_sums is not None:
+            drift = float(drift_from_sums(*shap_sums, len(X_test)))
+        else:
+            drift = float(exact_shap_drift(model_v1, model_v2, X_test, n_jobs=n_jobs,
+                                           checkpoint=checkpoint))
+        return {
+            "drift": drift,
+            "ci_low": drift,
+            "ci_high": drift,
+            "rows_used": len(X_test),
+            "total_rows": len(X_test),
+            "converged": True,
+        }
+
+    if mode == "approximate":
+        return approximate_shap_drift(
+            model_v1, model_v2, X_test, strata=strata, tol=tol,
+            checkpoint=checkpoint
         )
-    )
 
-    # SHAP Feature Drift
-    expl1 = shap.TreeExplainer(model_v1)
-    expl2 = shap.TreeExplainer(model_v2)
+    raise ValueError(f"Unknown drift mode: {mode!r}")
+
+
+def compute_metrics(model_v1, model_v2, X_test, inference=None,
+                    drift_mode="exact", drift_tol=DEFAULT_DRIFT_TOL, n_jobs=1):
+    X_test = ensure_frame(X_test, model_v1)
 
-    def extract_shap(expl):
-        sv = expl.shap_values(X_test)
-        if isinstance(sv, list):
-            return sv[1]
-        return sv[:, :, 1]
+    # Shared inference pass (one predict_proba per model)
+    if inference is None:
+        inference = run_inference(model_v1, model_v2, X_test)
 
-    s1 = extract_shap(expl1)
-    s2 = extract_shap(expl2)
+    # Prediction flip rate
+    flip_rate = prediction_flip_rate(inference)
+
+    # Confidence shift
+    conf_shift = confidence_shift(inference)
 
-    drift = np.mean(np.abs(
-        np.mean(np.abs(s1), axis=0) -
-        np.mean(np.abs(s2), axis=0)
-    ))
+    # SHAP Feature Drift (stratified by baseline prediction when sampled)
+    drift = feature_drift(
+        model_v1, model_v2, X_test,
+        mode=drift_mode, tol=drift_tol, strata=inference["pred_v1"],
+        n_jobs=n_jobs
+    )["drift"]
 
     return flip_rate, conf_shift, drift
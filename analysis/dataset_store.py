@@ -0,0 +1,212 @@
+"""
+Memory-mappable evaluation dataset format.
+
+A dataset is a directory:
+
+    schema.json    feature names, dtypes, row count, label name, fingerprint
+    features.npy   (rows, features) matrix in column-major order
+    index.npy      row index (row ids of data/wdbc.data for the shipped splits)
+    labels.npy     optional target vector
+
+features.npy is opened with mmap_mode="r", so loading only reads the
+schema, columns are contiguous, and every process that opens the same
+dataset shares one copy in the page cache. Loaders accept either a
+dataset directory or a legacy pickle.
+
+    python -m analysis.dataset_store pickle data/X_test.pkl data/y_test.pkl data/test
+    python -m analysis.dataset_store wdbc data/wdbc.data data/wdbc [--float32]
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import joblib
+import numpy as np
+import pandas as pd
+
+FORMAT_VERSION = 1
+SCHEMA_FILE = "schema.json"
+
+
+# ===============================
+# Writing
+# ===============================
+def content_fingerprint(features, index, labels, feature_names):
+    h = hashlib.sha256()
+    h.update(json.dumps([list(feature_names), str(features.dtype),
+                         list(features.shape)]).encode())
+    h.update(np.ascontiguousarray(features.T).tobytes())
+    h.update(np.ascontiguousarray(index).tobytes())
+    if labels is not None:
+        h.update(str(labels.dtype).encode())
+        h.update(np.ascontiguousarray(labels).tobytes())
+    return h.hexdigest()[:32]
+
+
+def save_dataset(directory, X, y=None, dtype=None):
+    """
+    Writes X (and y) as a dataset directory. dtype="float32" halves
+    the size; the shipped forests split on float32 values anyway.
+
+    Files are written into a temporary sibling directory that is
+    renamed into place, so readers never see a partial dataset.
+    """
+    features = np.asfortranarray(X.to_numpy(dtype=dtype or np.float64))
+    index = X.index.to_numpy()
+    labels = None if y is None else np.asarray(y)
+
+    if labels is not None and len(labels) != len(features):
+        raise ValueError("X and y have different lengths")
+
+    schema = {
+        "format": FORMAT_VERSION,
+        "rows": int(features.shape[0]),
+        "features": [str(c) for c in X.columns],
+        "dtype": str(features.dtype),
+        "index_dtype": str(index.dtype),
+        "label": None if labels is None else {
+            "name": getattr(y, "name", None),
+            "dtype": str(labels.dtype),
+        },
+        "fingerprint": content_fingerprint(features, index, labels, X.columns),
+    }
+
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=parent, suffix=".tmp")
+    try:
+        np.save(os.path.join(tmp, "features.npy"), features)
+        np.save(os.path.join(tmp, "index.npy"), index)
+        if labels is not None:
+            np.save(os.path.join(tmp, "labels.npy"), labels)
+        with open(os.path.join(tmp, SCHEMA_FILE), "w") as f:
+            json.dump(schema, f, indent=2)
+
+        if os.path.isdir(directory):
+            shutil.rmtree(directory)
+        os.replace(tmp, directory)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    return schema
+
+
+# ===============================
+# Reading
+# ===============================
+def is_dataset(path):
+    return os.path.isfile(os.path.join(path, SCHEMA_FILE))
+
+
+def read_schema(directory):
+    with open(os.path.join(directory, SCHEMA_FILE)) as f:
+        schema = json.load(f)
+    if schema.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported dataset format in {directory}")
+    return schema
+
+
+def open_dataset(directory, mmap=True):
+    """
+    (X, y, schema) for a dataset directory. X is a read-only DataFrame
+    backed by the memory-mapped feature matrix; y is None when the
+    dataset has no labels.
+    """
+    schema = read_schema(directory)
+    mode = "r" if mmap else None
+
+    features = np.load(os.path.join(directory, "features.npy"), mmap_mode=mode)
+    index = pd.Index(np.load(os.path.join(directory, "index.npy")))
+    if features.shape != (schema["rows"], len(schema["features"])):
+        raise ValueError(f"features.npy does not match the schema in {directory}")
+
+    columns = pd.Index(schema["features"], dtype=object)
+    X = pd.DataFrame(features, index=index, columns=columns, copy=False)
+
+    y = None
+    if schema["label"] is not None:
+        labels = np.load(os.path.join(directory, "labels.npy"))
+        y = pd.Series(labels, index=index, name=schema["label"]["name"])
+
+    return X, y, schema
+
+
+def load_features(path):
+    """
+    Feature frame from a dataset directory or a pickled DataFrame.
+    """
+    if is_dataset(path):
+        return open_dataset(path)[0]
+    return joblib.load(path)
+
+
+def load_labels(path):
+    """
+    Target vector from a dataset directory or a pickled Series.
+    """
+    if is_dataset(path):
+        y = open_dataset(path)[1]
+        if y is None:
+            raise ValueError(f"Dataset {path} has no labels")
+        return y
+    return joblib.load(path)
+
+
+def dataset_digest(directory):
+    return read_schema(directory)["fingerprint"]
+
+
+# ===============================
+# Converters
+# ===============================
+def convert_pickles(X_path, y_path, directory, dtype=None):
+    X = joblib.load(X_path)
+    y = joblib.load(y_path) if y_path else None
+    return save_dataset(directory, X, y, dtype=dtype)
+
+
+def convert_wdbc(csv_path, directory, dtype=None):
+    """
+    Converts data/wdbc.data (id, diagnosis, 30 features). Labels use
+    the canonical schema (analysis/schema.py), like the shipped splits.
+    """
+    from analysis.preprocess_data import read_raw_data
+
+    X, y = read_raw_data(csv_path)
+    return save_dataset(directory, X, y, dtype=dtype)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert data to the dataset format")
+    sub = parser.add_subparsers(dest="source", required=True)
+
+    p = sub.add_parser("pickle", help="from pickled X / y")
+    p.add_argument("X")
+    p.add_argument("y", nargs="?")
+    p.add_argument("output")
+
+    w = sub.add_parser("wdbc", help="from data/wdbc.data")
+    w.add_argument("csv")
+    w.add_argument("output")
+
+    for s in (p, w):
+        s.add_argument("--float32", action="store_true")
+
+    args = parser.parse_args(argv)
+    dtype = np.float32 if args.float32 else None
+
+    if args.source == "pickle":
+        schema = convert_pickles(args.X, args.y, args.output, dtype=dtype)
+    else:
+        schema = convert_wdbc(args.csv, args.output, dtype=dtype)
+
+    print(f"{args.output}: {schema['rows']} rows x {len(schema['features'])} "
+          f"{schema['dtype']} features, fingerprint {schema['fingerprint']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+
+import numpy as np
+
+from analysis.inference import ensure_frame
+
+DEFAULT_DRIFT_TOL = 0.001
+DEFAULT_CHUNK_ROWS = 2048
+
+
+# ===============================
+# SHAP Helpers
+# ===============================
+def class1_shap(explainer, X):
+    """
+    Positive-class SHAP values as a (rows, features) array,
+    whatever output layout the installed shap version uses.
+    """
+    shap_vals = explainer.shap_values(X)
+
+    # Case 1: list (one array per class)
+    if isinstance(shap_vals, list):
+        return shap_vals[1]
+
+    # Case 2: single array (samples, features, classes)
+    if shap_vals.ndim == 3:
+        return shap_vals[:, :, 1]
+
+    raise ValueError("Unexpected SHAP output format")
+
+
+def tree_explainer(model):
+    # shap is heavy to import; only pay for it when drift is computed
+    import shap
+    return shap.TreeExplainer(model)
+
+
+# ===============================
+# Chunked / Parallel SHAP Engine
+# ===============================
+def chunk_bounds(n_rows, chunk_size=DEFAULT_CHUNK_ROWS):
+    return [(start, min(start + chunk_size, n_rows))
+            for start in range(0, n_rows, chunk_size)]
+
+
+def shap_abs_sums(explainer, X, chunk_size=DEFAULT_CHUNK_ROWS, checkpoint=None):
+    """
+    Per-feature sum of |SHAP| (positive class), reduced chunk by
+    chunk so only one chunk's SHAP array is alive at a time.
+    `checkpoint` (analysis/instrumentation.py) runs before each chunk.
+    """
+    sums = np.zeros(X.shape[1])
+    for start, stop in chunk_bounds(len(X), chunk_size):
+        if checkpoint is not None:
+            checkpoint()
+        sums += np.abs(class1_shap(explainer, X.iloc[start:stop])).sum(axis=0)
+    return sums
+
+
+def shap_abs_rows(explainer, X, chunk_size=DEFAULT_CHUNK_ROWS, checkpoint=None):
+    """
+    Per-row |SHAP| (positive class) as a (rows, features) array.
+    """
+    out = np.empty(X.shape)
+    for start, stop in chunk_bounds(len(X), chunk_size):
+        if checkpoint is not None:
+            checkpoint()
+        out[start:stop] = np.abs(class1_shap(explainer, X.iloc[start:stop]))
+    return out
+
+
+def abs_sums_from_rows(abs_rows, chunk_size=DEFAULT_CHUNK_ROWS):
+    """
+    Reduces per-row |SHAP| exactly like shap_abs_sums does (same
+    chunks, same order), so the sums are bit-identical.
+    """
+    sums = np.zeros(abs_rows.shape[1])
+    for start, stop in chunk_bounds(len(abs_rows), chunk_size):
+        sums += np.ascontiguousarray(abs_rows[start:stop]).sum(axis=0)
+    return sums
+
+
+# Per-process state: explainers and data are set up once per
+# worker by the pool initializer, not shipped with every chunk.
+_WORKER = {}
+
+
+def _init_shap_worker(models, X):
+    _WORKER["explainers"] = [tree_explainer(m) for m in models]
+    _WORKER["X"] = X
+
+
+def _shap_chunk_sums(model_idx, start, stop):
+    explainer = _WORKER["explainers"][model_idx]
+    rows = _WORKER["X"].iloc[start:stop]
+    return np.abs(class1_shap(explainer, rows)).sum(axis=0)
+
+
+def _shap_chunk_rows(model_idx, start, stop):
+    explainer = _WORKER["explainers"][model_idx]
+    return np.abs(class1_shap(explainer, _WORKER["X"].iloc[start:stop]))
+
+
+def _collect(pool, futures, checkpoint):
+    """
+    Yields the results of `futures` in order, running `checkpoint`
+    before each; chunks not started yet are dropped if it raises.
+    """
+    try:
+        for f in futures:
+            if checkpoint is not None:
+                checkpoint()
+            yield f.result()
+    except BaseException:
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+
+
+def parallel_shap_abs_rows(models, X, n_jobs=None,
+                           chunk_size=DEFAULT_CHUNK_ROWS, checkpoint=None):
+    """
+    Per-row |SHAP| arrays for several models, chunks spread over a
+    process pool like parallel_shap_abs_sums.
+    """
+    X = ensure_frame(X, models[0])
+    n_jobs = n_jobs or os.cpu_count() or 1
+
+    if n_jobs == 1 or len(X) <= chunk_size:
+        return [shap_abs_rows(tree_explainer(m), X, chunk_size, checkpoint)
+                for m in models]
+
+    with ProcessPoolExecutor(
+        max_workers=n_jobs,
+        initializer=_init_shap_worker,
+        initargs=(models, X),
+    ) as pool:
+        futures = [
+            pool.submit(_shap_chunk_rows, i, start, stop)
+            for i in range(len(models))
+            for start, stop in chunk_bounds(len(X), chunk_size)
+        ]
+        rows = list(_collect(pool, futures, checkpoint))
+
+    n_chunks = len(rows) // len(models)
+    return [np.concatenate(rows[i * n_chunks:(i + 1) * n_chunks])
+            for i in range(len(models))]
+
+
+def parallel_shap_abs_sums(models, X, n_jobs=None,
+                           chunk_size=DEFAULT_CHUNK_ROWS, checkpoint=None):
+    """
+    Per-feature |SHAP| sums for several models over the same rows.
+
+    Chunks of every model are scheduled on one process pool; each
+    worker returns only a (features,) vector per chunk. Partial
+    sums are added in chunk order, so the result does not depend
+    on n_jobs. `checkpoint` runs before each chunk is collected, so
+    a cancelled job stops mid-stage.
+    """
+    X = ensure_frame(X, models[0])
+    n_jobs = n_jobs or os.cpu_count() or 1
+    bounds = chunk_bounds(len(X), chunk_size)
+
+    # A single chunk gains nothing from a pool that costs a fork and
+    # a copy of X per worker
+    if n_jobs == 1 or len(X) <= chunk_size:
+        return [shap_abs_sums(tree_explainer(m), X, chunk_size, checkpoint)
+                for m in models]
+
+    with ProcessPoolExecutor(
+        max_workers=n_jobs,
+        initializer=_init_shap_worker,
+        initargs=(models, X),
+    ) as pool:
+        futures = [
+            pool.submit(_shap_chunk_sums, i, start, stop)
+            for i in range(len(models))
+            for start, stop in bounds
+        ]
+        partials = _collect(pool, futures, checkpoint)
+        results = []
+        for _ in models:
+            sums = np.zeros(X.shape[1])
+            for _ in bounds:
+                sums += next(partials)
+            results.append(sums)
+
+    return results
+
+
+# ===============================
+# Exact Drift
+# ===============================
+def exact_shap_drift(model_v1, model_v2, X_test, n_jobs=1,
+                     chunk_size=DEFAULT_CHUNK_ROWS, checkpoint=None):
+    """
+    Mean absolute difference of per-feature mean |SHAP| over all rows.
+
+    Rows are explained in chunks (memory stays flat as X_test grows);
+    n_jobs > 1 spreads the chunks of both models over a process pool.
+    """
+    X_test = ensure_frame(X_test, model_v1)
+
+    sums1, sums2 = parallel_shap_abs_sums(
+        [model_v1, model_v2], X_test, n_jobs=n_jobs, chunk_size=chunk_size,
+        checkpoint=checkpoint
+    )
+
+    return drift_from_sums(sums1, sums2, len(X_test))
+
+
+def drift_from_sums(sums1, sums2, n_rows):
+    """
+    Drift from two models' per-feature |SHAP| sums over the same rows.
+    """
+    return np.mean(np.abs(
+        sums1 / n_rows -
+        sums2 / n_rows
+    ))
+
+
+# ===============================
+# Approximate Drift
+# ===============================
+def stratified_order(strata, random_state=0):
+    """
+    Row order in which every prefix is (approximately) a
+    proportional stratified sample of the rows.
+    """
+    rng = np.random.default_rng(random_state)
+    strata = np.asarray(strata)
+    rank = np.empty(len(strata))
+
+    for value in np.unique(strata):
+        idx = np.flatnonzero(strata == value)
+        pos = rng.permutation(len(idx))
+        rank[idx] = (pos + rng.random(len(idx))) / len(idx)
+
+    return np.argsort(rank, kind="stable")
+
+
+def approximate_shap_drift(model_v1, model_v2, X_test, strata=None,
+                           tol=DEFAULT_DRIFT_TOL, confidence=0.95,
+                           initial_rows=64, growth=2.0, random_state=0,
+                           checkpoint=None):
+    """
+    Estimates SHAP feature drift on a growing stratified sample.
+
+    The sample doubles (by `growth`) until the half-width of the
+    confidence interval is at most `tol`, or every row is used.
+
+    The interval is a delta-method normal interval: drift equals the
+    row mean of g_i = mean_j sign(D_j) * (|s1_ij| - |s2_ij|), where D
+    is the current per-feature difference, so its standard error is
+    std(g) / sqrt(n) with a finite-population correction.
+    """
+    X_test = ensure_frame(X_test, model_v1)
+    n_total = len(X_test)
+
+    if strata is None:
+        strata = np.zeros(n_total, dtype=int)
+    order = stratified_order(strata, random_state)
+
+    expl1 = tree_explainer(model_v1)
+    expl2 = tree_explainer(model_v2)
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+
+    diffs = []
+    n_used = 0
+    n_next = min(initial_rows, n_total)
+
+    while True:
+        if checkpoint is not None:
+            checkpoint()
+        rows = X_test.iloc[order[n_used:n_next]]
+        diffs.append(
+            np.abs(class1_shap(expl1, rows)) - np.abs(class1_shap(expl2, rows))
+        )
+        n_used = n_next
+
+        d = np.concatenate(diffs)
+        per_feature = d.mean(axis=0)
+        drift = np.mean(np.abs(per_feature))
+
+        if n_used == n_total:
+            half_width = 0.0
+        elif n_used < 2:
+            half_width = math.inf
+        else:
+            g = d @ np.sign(per_feature) / d.shape[1]
+            fpc = (n_total - n_used) / (n_total - 1)
+            half_width = z * np.std(g, ddof=1) / math.sqrt(n_used) * math.sqrt(fpc)
+
+        if half_width <= tol or n_used == n_total:
+            break
+        n_next = min(n_total, max(n_used + 1, math.ceil(n_used * growth)))
+
+    return {
+        "drift": float(drift),
+        "ci_low": float(max(0.0, drift - half_width)),
+        "ci_high": float(drift + half_width),
+        "rows_used": int(n_used),
+        "total_rows": int(n_total),
+        "converged": bool(half_width <= tol),
+    }
@@ -1,36 +1,16 @@
-import joblib
-from analysis.compute_metrics import compute_metrics
-from analysis.subgroup_risk import compute_subgroup_risk
+import argparse
+import json
+import sys
 
+# Heavy dependencies (joblib/sklearn, pandas, shap) are imported inside
+# main() only once a stage needs them, so `--help` and argument errors
+# return immediately and CI never pays for matplotlib or streamlit.
 
-# ===============================
-# Risk Score Computation Function
-# ===============================
-def compute_final_risk_score(
-    prediction_flip_rate,
-    confidence_shift,
-    feature_drift,
-    subgroup_risk
-):
-    """
-    Computes the final deployment risk score
-    using weighted aggregation of risk elements.
-    """
-
-    # Weights (configurable policy)
-    w_flip = 0.40
-    w_conf = 0.30
-    w_feat = 0.20
-    w_sub = 0.10
-
-    risk_score = (
-        w_flip * prediction_flip_rate +
-        w_conf * confidence_shift +
-        w_feat * feature_drift +
-        w_sub * subgroup_risk
-    )
-
-    return risk_score
+EXIT_CODES = {
+    "DEPLOY": 0,
+    "REVIEW": 10,
+    "ROLLBACK": 20,
+}
 
 
 # ===============================
@@ -59,7 +39,8 @@ def explain_risk(
             "Significant confidence shift observed in model predictions"
         )
 
-    if feature_drift > 0.05:
+    # None when early exit skipped the SHAP stage
+    if feature_drift is not None and feature_drift > 0.05:
         explanations.append(
             "Model reasoning changed significantly (feature importance drift)"
         )
@@ -80,68 +61,212 @@ def explain_risk(
 # ===============================
 # MAIN EXECUTION
 # ===============================
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Headless model update risk gate. Exit code: "
+                    "0 = DEPLOY, 10 = REVIEW, 20 = ROLLBACK."
+    )
+    parser.add_argument("--baseline", required=True, help="baseline model .pkl")
+    parser.add_argument("--candidate", required=True, help="candidate model .pkl")
+    parser.add_argument("--X-test", default="data/test")
+    parser.add_argument("--y-test", default="data/test")
+    parser.add_argument("--feature", default="mean radius")
+    parser.add_argument("--drift-mode", choices=["exact", "approximate"], default="exact")
+    parser.add_argument("--drift-tol", type=float, default=0.001)
+    parser.add_argument("--jobs", type=int, default=1)
+    parser.add_argument("--bootstrap", type=int, default=0, metavar="N",
+                        help="bootstrap replicates for confidence intervals")
+    parser.add_argument("--decide-on", choices=["point", "upper"], default="point",
+                        help="gate on the point score or the interval's upper bound")
+    parser.add_argument("--early-exit", choices=["bounds", "approximate"], default=None,
+                        help="skip SHAP drift when the other components already settle "
+                             "the decision; 'approximate' also settles on a sampled 95%% "
+                             "drift interval, which can differ from the exact decision "
+                             "in up to ~2.5%% of those cases")
+    parser.add_argument("--scan-subgroups", action="store_true",
+                        help="rank quantile subgroups across all features")
+    parser.add_argument("--bins", type=int, default=3,
+                        help="quantile bins per feature for --scan-subgroups")
+    parser.add_argument("--cache-dir", default=None,
+                        help="persistent per-model summary cache directory")
+    parser.add_argument("--row-cache", metavar="DIR", default=None,
+                        help="per-row result cache: on a grown evaluation set only "
+                             "the new rows are scored and explained")
+    parser.add_argument("--shard-rows", type=int, metavar="N", default=None,
+                        help="map-reduce evaluation in row shards of N on --jobs "
+                             "worker processes")
+    parser.add_argument("--stream", metavar="PATH", default=None,
+                        help="evaluate a raw wdbc-style CSV (or a .parquet file with a "
+                             "'target' column) chunk by chunk instead of --X-test/--y-test")
+    parser.add_argument("--chunk-rows", type=int, metavar="N", default=None,
+                        help="rows per chunk for --stream (default 50000)")
+    parser.add_argument("--output", default="-",
+                        help="JSON report path ('-' for stdout)")
+    parser.add_argument("--report-html", metavar="PATH",
+                        help="also write a self-contained HTML report (chart, "
+                             "drift table, subgroups); reuses --cache-dir summaries")
+    parser.add_argument("--report-png", metavar="PATH",
+                        help="also write the risk component chart as PNG")
+    parser.add_argument("--profile", action="store_true",
+                        help="add per-stage timings to the report")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="per-stage traced memory peaks (slower)")
+    parser.add_argument("--trace", metavar="PATH",
+                        help="write a Chrome/Perfetto trace of the stages")
+    return parser
 
-# Load test data
-X_test = joblib.load("data/X_test.pkl")
-y_test = joblib.load("data/y_test.pkl")
-
-# Load baseline model
-model_v1 = joblib.load("models/model_v1.pkl")
-
-# 🔁 Select updated model version here
-model_v2 = joblib.load("models/model_v2_safe.pkl")
-# model_v2 = joblib.load("models/model_v2_caution.pkl")
-# model_v2 = joblib.load("models/model_v2_block.pkl")
-
-# Compute core risk metrics
-prediction_flip_rate, confidence_shift, feature_drift = compute_metrics(
-    model_v1, model_v2, X_test
-)
-
-subgroup_risk = compute_subgroup_risk(
-    model_v1,
-    model_v2,
-    X_test,
-    y_test,
-    feature="mean radius"
-)
-
-# Compute final risk score
-final_risk_score = compute_final_risk_score(
-    prediction_flip_rate,
-    confidence_shift,
-    feature_drift,
-    subgroup_risk
-)
-
-# Deployment decision
-if final_risk_score < 0.30:
-    decision = "✅ Safe to Deploy"
-elif final_risk_score < 0.60:
-    decision = "⚠️ Deploy with Caution"
-else:
-    decision = "❌ Block Deployment"
-
-# Explainability
-explanations = explain_risk(
-    prediction_flip_rate,
-    confidence_shift,
-    feature_drift,
-    subgroup_risk
-)
 
-# ===============================
-# OUTPUT
-# ===============================
-print("\n====== MODEL UPDATE RISK ASSESSMENT ======")
-print(f"Prediction Flip Rate : {prediction_flip_rate:.4f}")
-print(f"Confidence Shift     : {confidence_shift:.4f}")
-print(f"Feature Drift        : {feature_drift:.6f}")
-print(f"Subgroup Risk        : {subgroup_risk:.4f}")
-
-print("\nFinal Risk Score     :", round(final_risk_score, 4))
-print("Deployment Decision :", decision)
-
-print("\nRisk Explanation:")
-for exp in explanations:
-    print("-", exp)
+def parse_args(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    # Rejected by evaluate_risk too, but CI should get a usage error
+    # (exit 2) rather than a traceback
+    if args.early_exit and args.bootstrap > 0:
+        parser.error("--early-exit cannot be combined with --bootstrap")
+    if args.decide_on == "upper" and args.bootstrap <= 0:
+        parser.error("--decide-on upper requires --bootstrap N")
+    if args.row_cache and (args.early_exit or args.cache_dir):
+        parser.error("--row-cache cannot be combined with --early-exit or --cache-dir")
+
+    engines = [flag for flag, value in (("--row-cache", args.row_cache),
+                                        ("--shard-rows", args.shard_rows),
+                                        ("--stream", args.stream)) if value]
+    if len(engines) > 1:
+        parser.error(f"{' and '.join(engines)} cannot be combined")
+    if args.shard_rows or args.stream:
+        # Point estimates from mergeable counts and sums only
+        unsupported = [flag for flag, value in (
+            ("--drift-mode approximate", args.drift_mode != "exact"),
+            ("--bootstrap", args.bootstrap > 0),
+            ("--early-exit", args.early_exit),
+            ("--scan-subgroups", args.scan_subgroups),
+            ("--cache-dir", args.cache_dir),
+            ("--report-html", args.report_html),
+            ("--report-png", args.report_png),
+        ) if value]
+        if unsupported:
+            parser.error(f"{engines[0]} does not support {', '.join(unsupported)}")
+    return args
+
+
+def run(args):
+    from analysis.instrumentation import Profiler, stage
+
+    profiler = None
+    if args.profile or args.trace or args.trace_memory:
+        profiler = Profiler(trace_memory=args.trace_memory)
+
+    with stage(profiler, "imports"):
+        import joblib
+        from analysis.dataset_store import load_features, load_labels
+        from analysis.risk_pipeline import evaluate_risk
+        from analysis.summary_cache import SummaryCache
+
+    with stage(profiler, "model_load"):
+        baseline_model = joblib.load(args.baseline)
+        updated_model = joblib.load(args.candidate)
+
+    if args.stream:
+        from analysis.schema import FEATURE_NAMES
+        from analysis.streaming import (
+            DEFAULT_CHUNK_SIZE, csv_chunks, parquet_chunks, stream_risk,
+        )
+
+        # Raw file layout (analysis/schema.py), not the model's column order
+        read = parquet_chunks if args.stream.endswith(".parquet") else csv_chunks
+        chunks = read(args.stream, FEATURE_NAMES,
+                      chunksize=args.chunk_rows or DEFAULT_CHUNK_SIZE)
+        with stage(profiler, "stream_risk"):
+            report = stream_risk(baseline_model, updated_model, chunks,
+                                 feature=args.feature)
+        if profiler is not None:
+            report["timings"] = profiler.summary()
+        return finish_report(report, args, profiler)
+
+    # Load evaluation data
+    with stage(profiler, "data_load"):
+        X_test = load_features(args.X_test)
+        y_test = load_labels(args.y_test)
+
+    if args.shard_rows:
+        from analysis.sharded import sharded_risk
+
+        with stage(profiler, "sharded_risk", rows=len(X_test)):
+            report = sharded_risk(baseline_model, updated_model, X_test, y_test,
+                                  feature=args.feature, n_workers=args.jobs,
+                                  shard_rows=args.shard_rows)
+        if profiler is not None:
+            report["timings"] = profiler.summary()
+        return finish_report(report, args, profiler)
+
+    cache = SummaryCache(args.cache_dir) if args.cache_dir else None
+    options = dict(
+        feature=args.feature,
+        drift_mode=args.drift_mode,
+        drift_tol=args.drift_tol,
+        n_jobs=args.jobs,
+        scan_features="all" if args.scan_subgroups else None,
+        n_bins=args.bins,
+        profiler=profiler,
+        n_boot=args.bootstrap,
+        decide_on=args.decide_on
+    )
+    if args.row_cache:
+        from analysis.row_cache import RowCache, incremental_risk
+
+        report = incremental_risk(baseline_model, updated_model, X_test, y_test,
+                                  RowCache(args.row_cache), **options)
+    else:
+        report = evaluate_risk(baseline_model, updated_model, X_test, y_test,
+                               cache=cache, early_exit=args.early_exit, **options)
+
+    if args.report_html or args.report_png:
+        from analysis.report_artifacts import render_report
+
+        with stage(profiler, "render_report"):
+            artifacts = render_report(report, baseline_model, updated_model,
+                                      X_test, y_test, feature=args.feature,
+                                      cache=cache)
+        for kind, path in (("html", args.report_html), ("png", args.report_png)):
+            if path:
+                with open(path, "wb") as f:
+                    f.write(artifacts[kind])
+
+    return finish_report(report, args, profiler)
+
+
+def finish_report(report, args, profiler=None):
+    """
+    Trace file, explanations and model paths, for every engine.
+    """
+    if args.trace:
+        profiler.write_trace(args.trace)
+
+    report["explanations"] = explain_risk(
+        report["flip_rate"],
+        report["conf_shift"],
+        report["feature_drift"],
+        report["subgroup_risk"]
+    )
+    report["baseline"] = args.baseline
+    report["candidate"] = args.candidate
+    return report
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run(args)
+
+    payload = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(payload)
+    else:
+        with open(args.output, "w") as f:
+            f.write(payload + "\n")
+
+    return EXIT_CODES[report["decision"]]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""
+Drill-down into the rows on which two models disagree.
+
+prediction_flip_rate reduces flips to one number; the explorer lists
+the flipped rows themselves, ranked by how far the probabilities
+moved, and the nearest neighbours of any row with both models'
+predictions, so a reviewer can see whether a flip is an isolated
+borderline case or a whole region of the feature space that moved.
+
+Neighbours are found with a KD-tree over the standardized features,
+built once per dataset and shared across model pairs. Probabilities
+come from the cached inference pass (analysis/summary_cache.py);
+nothing here calls predict.
+"""
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from analysis.inference import ensure_frame, inference_from_proba
+from analysis.result_cache import ResultCache
+from analysis.summary_cache import dataset_fingerprint, model_summaries
+
+DEFAULT_NEIGHBORS = 10
+DEFAULT_TOP_FLIPS = 50
+
+# KD-tree leaf size: larger leaves build faster and cost little at
+# query time for the small k used here
+LEAF_SIZE = 32
+
+
+# ===============================
+# Feature Index
+# ===============================
+class FeatureIndex:
+    """
+    KD-tree over z-scored features of one evaluation set. Constant
+    columns are left unscaled so they do not divide by zero.
+    """
+
+    def __init__(self, X):
+        values = np.asarray(X, dtype=np.float64)
+        self.mean = values.mean(axis=0)
+        scale = values.std(axis=0)
+        self.scale = np.where(scale > 0, scale, 1.0)
+
+        # The standardized matrix lives on only as tree.data
+        self.tree = cKDTree((values - self.mean) / self.scale,
+                            leafsize=LEAF_SIZE, balanced_tree=False,
+                            compact_nodes=False)
+
+    def __len__(self):
+        return self.tree.n
+
+    def query(self, positions, k=DEFAULT_NEIGHBORS):
+        """
+        (distances, positions) of the k nearest rows to each row in
+        `positions`, excluding the row itself.
+        """
+        points = self.tree.data[np.atleast_1d(positions)]
+        k = min(k + 1, len(self))
+        dist, idx = self.tree.query(points, k=k)
+        dist, idx = dist.reshape(len(points), k), idx.reshape(len(points), k)
+
+        # Drop each row's own entry (or the farthest one when duplicate
+        # rows put another row at distance 0 first)
+        own = idx == np.atleast_1d(positions)[:, None]
+        own[~own.any(axis=1), -1] = True
+        keep = ~own
+        return (dist[keep].reshape(len(points), k - 1),
+                idx[keep].reshape(len(points), k - 1))
+
+
+# Indexes of the last few evaluation sets, keyed by dataset fingerprint
+_INDEXES = ResultCache(maxsize=4)
+
+
+def feature_index(X, key=None, cache=_INDEXES):
+    """
+    FeatureIndex of X, built once per dataset. `key` (e.g. the
+    dataset's file_digest) saves hashing a large frame.
+    """
+    key = key or dataset_fingerprint(X)
+    index = cache.get(key)
+    if index is None:
+        index = FeatureIndex(X)
+        cache.put(key, index)
+    return index
+
+
+# ===============================
+# Flip Explorer
+# ===============================
+class FlipExplorer:
+    """
+    Flipped rows of a baseline / candidate pair and their neighbours,
+    from the shared inference record (analysis/inference.py).
+
+    `delta` is the mean absolute probability change of a row, so its
+    mean over all rows is the report's confidence shift.
+    """
+
+    def __init__(self, index, X, inference, y=None):
+        self.index = index
+        self.X = X
+        self.proba_v1 = inference["proba_v1"]
+        self.proba_v2 = inference["proba_v2"]
+        self.pred_v1 = inference["pred_v1"]
+        self.pred_v2 = inference["pred_v2"]
+        self.y = None if y is None else np.asarray(y)
+        self.delta = np.abs(self.proba_v1 - self.proba_v2).mean(axis=1)
+        self.flipped = np.flatnonzero(self.pred_v1 != self.pred_v2)
+
+    def _rows(self, positions, **extra):
+        rows = pd.DataFrame({
+            "row": self.X.index[positions],
+            **extra,
+            "pred_v1": self.pred_v1[positions],
+            "pred_v2": self.pred_v2[positions],
+            # Probability of the last class (benign for the WDBC encoding)
+            "proba_v1": self.proba_v1[positions, -1],
+            "proba_v2": self.proba_v2[positions, -1],
+            "delta": self.delta[positions],
+            "flipped": self.pred_v1[positions] != self.pred_v2[positions],
+        })
+        if self.y is not None:
+            rows["label"] = self.y[positions]
+        return rows
+
+    def top_flips(self, n=DEFAULT_TOP_FLIPS):
+        """
+        The n flipped rows with the largest delta, largest first.
+        Only those n are sorted (argpartition), so this stays fast
+        on replay sets with many flips.
+        """
+        flipped = self.flipped
+        if n is not None and n < len(flipped):
+            top = np.argpartition(-self.delta[flipped], n - 1)[:n]
+            flipped = flipped[top]
+        order = np.argsort(-self.delta[flipped], kind="stable")
+        return self._rows(flipped[order])
+
+    def neighbors(self, row, k=DEFAULT_NEIGHBORS):
+        """
+        The k nearest rows to `row` (an index label of X) in
+        standardized feature space, nearest first, with both models'
+        predictions.
+        """
+        position = self.X.index.get_loc(row)
+        if not isinstance(position, (int, np.integer)):
+            raise ValueError(f"Row label {row!r} is not unique in the evaluation data")
+        dist, idx = self.index.query([position], k=k)
+        return self._rows(idx[0], distance=dist[0])
+
+
+def flip_explorer(baseline_model, updated_model, X_test, y_test=None,
+                  cache=None, data_key=None):
+    """
+    FlipExplorer for a model pair. Probabilities are read from `cache`
+    (a SummaryCache) when the pair was evaluated on X_test before.
+    """
+    X_test = ensure_frame(X_test, baseline_model)
+    base, cand = model_summaries([baseline_model, updated_model], X_test,
+                                 cache=cache, with_shap=False)
+    inference = inference_from_proba(baseline_model, updated_model,
+                                     base["proba"], cand["proba"])
+    return FlipExplorer(feature_index(X_test, data_key), X_test, inference, y=y_test)
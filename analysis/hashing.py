@@ -0,0 +1,31 @@
+"""
+Content digests of input files, shared by the caches and preprocessing.
+"""
+import hashlib
+import os
+
+from analysis.dataset_store import dataset_digest, is_dataset
+
+# (path, size, mtime) -> digest, so large uploads are hashed once
+_DIGESTS = {}
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """
+    SHA-256 of a file's content, read in chunks. Dataset directories
+    (analysis/dataset_store.py) use the fingerprint in their schema.
+    """
+    if is_dataset(path):
+        return dataset_digest(path)
+
+    st = os.stat(path)
+    stamp = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    if stamp in _DIGESTS:
+        return _DIGESTS[stamp]
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    _DIGESTS[stamp] = h.hexdigest()
+    return _DIGESTS[stamp]
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+
+def ensure_frame(X, model):
+    """
+    Returns X as a DataFrame carrying the model's feature names.
+    """
+    if not isinstance(X, pd.DataFrame):
+        X = pd.DataFrame(X, columns=model.feature_names_in_)
+    return X
+
+
+def labels_from_proba(model, proba):
+    """
+    Derives class labels from a probability matrix exactly
+    the way sklearn's predict does (argmax over classes_).
+    """
+    return model.classes_.take(np.argmax(proba, axis=1), axis=0)
+
+
+def run_inference(model_v1, model_v2, X_test):
+    """
+    Single inference pass shared by all risk metrics.
+
+    predict_proba is called exactly once per model; labels are
+    derived from the probabilities instead of calling predict,
+    which would walk every tree a second time.
+    """
+    X_test = ensure_frame(X_test, model_v1)
+
+    return inference_from_proba(
+        model_v1,
+        model_v2,
+        model_v1.predict_proba(X_test),
+        model_v2.predict_proba(X_test)
+    )
+
+
+def inference_from_proba(model_v1, model_v2, proba_v1, proba_v2):
+    """
+    Builds the shared inference record from already computed
+    (e.g. cached) probability matrices.
+    """
+    return {
+        "proba_v1": proba_v1,
+        "proba_v2": proba_v2,
+        "pred_v1": labels_from_proba(model_v1, proba_v1),
+        "pred_v2": labels_from_proba(model_v2, proba_v2),
+    }
+
+
+def group_accuracies(correct, codes, n_groups):
+    """
+    Per-group accuracy and size from a boolean correctness
+    vector and integer group codes, as one grouped reduction.
+    """
+    sizes = np.bincount(codes, minlength=n_groups)
+    hits = np.bincount(codes, weights=correct, minlength=n_groups)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        acc = hits / sizes
+
+    return acc, sizes
@@ -0,0 +1,123 @@
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+_NULL_STAGE = nullcontext()
+
+
+def stage(profiler, name, rows=None):
+    """
+    `with stage(profiler, "shap", rows=n):` records the block when a
+    profiler is given; with profiler=None it is a shared no-op context.
+    """
+    if profiler is None:
+        return _NULL_STAGE
+    return profiler.stage(name, rows)
+
+
+def checkpoint(profiler):
+    """
+    Callable that chunked loops run between chunks, or None without a
+    profiler. A JobProfiler's raises once its job is cancelled.
+    """
+    return None if profiler is None else profiler.checkpoint
+
+
+def _max_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return rss / 2**20 if sys.platform == "darwin" else rss / 2**10
+
+
+class Profiler:
+    """
+    Per-stage wall time, CPU time, memory and row counts for one risk run.
+
+    Memory is the process peak RSS after the stage by default (free
+    to read). trace_memory=True reports each stage's own peak of
+    traced allocations instead, at the cost of running tracemalloc.
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.records = []
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        elif self.trace_memory:
+            tracemalloc.reset_peak()
+
+        start = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - start
+            cpu = time.process_time() - cpu
+            if self.trace_memory:
+                peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+                if tracing:
+                    tracemalloc.stop()
+            else:
+                peak_mb = _max_rss_mb()
+
+            with self._lock:
+                self.records.append({
+                    "stage": name,
+                    "start_s": start - self._origin,
+                    "wall_s": wall,
+                    "cpu_s": cpu,
+                    "peak_mb": peak_mb,
+                    "rows": rows,
+                    "thread": threading.get_ident(),
+                })
+
+    def checkpoint(self):
+        """
+        Called between chunks of long stages; a no-op here.
+        """
+
+    def summary(self):
+        """
+        Stage records without the trace-only fields, in start order.
+        """
+        return [
+            {k: r[k] for k in ("stage", "wall_s", "cpu_s", "peak_mb", "rows")}
+            for r in sorted(self.records, key=lambda r: r["start_s"])
+        ]
+
+    def chrome_trace(self):
+        """
+        Trace Event Format (chrome://tracing, Perfetto, speedscope).
+        """
+        pid = os.getpid()
+        return {
+            "traceEvents": [
+                {
+                    "name": r["stage"],
+                    "ph": "X",
+                    "ts": r["start_s"] * 1e6,
+                    "dur": r["wall_s"] * 1e6,
+                    "pid": pid,
+                    "tid": r["thread"],
+                    "args": {"cpu_s": r["cpu_s"], "peak_mb": r["peak_mb"],
+                             "rows": r["rows"]},
+                }
+                for r in self.records
+            ],
+            "displayTimeUnit": "ms",
+        }
+
+    def write_trace(self, path):
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f)
@@ -0,0 +1,273 @@
+"""
+Background job queue for risk analyses.
+
+A fixed number of worker threads runs analyses taken from a bounded
+queue, so concurrent reviews get predictable latency instead of all
+competing for the CPU at once. Each job reports the stage it is in
+and the rows processed so far (through the Profiler stages of the
+risk pipeline). Identical requests (same key) share one job; each
+submit() subscribes its caller and unsubscribe() cancels the job once
+its last subscriber leaves: a queued job never starts, a running one
+stops at its next stage boundary or SHAP chunk.
+"""
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from analysis.instrumentation import Profiler
+
+DEFAULT_WORKERS = int(os.environ.get("MODELGUARD_JOB_WORKERS", 2))
+DEFAULT_MAX_PENDING = 16
+FINISHED_JOBS_KEPT = 100
+
+FINAL_STATES = ("done", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class QueueFull(RuntimeError):
+    pass
+
+
+class Job:
+    """
+    One queued / running / finished analysis.
+    """
+
+    def __init__(self, job_id, key=None):
+        self.id = job_id
+        self.key = key
+        self.status = "queued"
+        self.stage = None
+        self.stages_done = 0
+        self.rows_processed = 0
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = None
+        self.profiler = JobProfiler(self)
+        self.subscribers = 0
+        self._cancel = threading.Event()
+        self._future = None
+
+    @property
+    def done(self):
+        return self.status in FINAL_STATES
+
+    def cancel(self):
+        """
+        Cancels the job for every subscriber; see JobQueue.unsubscribe.
+        """
+        self._cancel.set()
+        if self._future is not None and self._future.cancel():
+            self._finish("cancelled")
+
+    def _finish(self, status):
+        self.status = status
+        self.stage = None
+        self.finished = time.time()
+
+    def _check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled(self.id)
+
+    def _enter_stage(self, name):
+        self._check_cancelled()
+        self.stage = name
+
+    def _leave_stage(self, rows):
+        self.stages_done += 1
+        self.rows_processed += rows or 0
+
+    def progress(self):
+        end = self.finished or time.time()
+        return {
+            "id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "stages_done": self.stages_done,
+            "rows_processed": self.rows_processed,
+            "elapsed_s": end - (self.started or self.submitted),
+        }
+
+
+class JobProfiler(Profiler):
+    """
+    Profiler that publishes each stage to its job and raises
+    JobCancelled at the next stage or chunk once the job is cancelled.
+    """
+
+    def __init__(self, job, trace_memory=False):
+        super().__init__(trace_memory=trace_memory)
+        self.job = job
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        self.job._enter_stage(name)
+        with super().stage(name, rows):
+            yield
+        self.job._leave_stage(rows)
+
+    def checkpoint(self):
+        self.job._check_cancelled()
+
+
+class JobQueue:
+    """
+    Bounded worker pool with a bounded queue of pending jobs.
+
+    submit(fn) runs fn(profiler) on a worker; pass the profiler on to
+    the risk pipeline for progress and cancellation. Every submit()
+    must be paired with an unsubscribe() when the caller stops
+    waiting for the job.
+    """
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, max_pending=DEFAULT_MAX_PENDING):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="risk-job")
+        self._jobs = OrderedDict()
+        self._active = {}
+        self._ids = itertools.count(1)
+        # Re-entrant: a job that finishes before submit() returns runs
+        # its release callback while the lock is still held
+        self._lock = threading.RLock()
+
+    def submit(self, fn, key=None):
+        with self._lock:
+            active = self._active.get(key) if key is not None else None
+            if active is not None and not active._cancel.is_set():
+                active.subscribers += 1
+                return active
+
+            if self._count("queued") >= self.max_pending:
+                raise QueueFull(f"{self.max_pending} analyses are already waiting")
+
+            job = Job(next(self._ids), key)
+            job.subscribers = 1
+            self._jobs[job.id] = job
+            if key is not None:
+                self._active[key] = job
+            job._future = self._executor.submit(self._run, job, fn)
+            # Also runs when a queued job is cancelled before it starts
+            job._future.add_done_callback(lambda _: self._release(job))
+            self._trim()
+            return job
+
+    def unsubscribe(self, job):
+        """
+        Drops one subscriber of `job`; cancels it when none are left.
+        Returns True when this call cancelled the job.
+        """
+        with self._lock:
+            job.subscribers = max(0, job.subscribers - 1)
+            if job.subscribers or job.done:
+                return False
+        job.cancel()
+        return True
+
+    def _run(self, job, fn):
+        if job._cancel.is_set():
+            job._finish("cancelled")
+            return
+
+        job.status = "running"
+        job.started = time.time()
+        try:
+            job.result = fn(job.profiler)
+            job._finish("done")
+        except JobCancelled:
+            job._finish("cancelled")
+        except Exception as e:
+            job.error = e
+            job._finish("failed")
+
+    def _release(self, job):
+        with self._lock:
+            if self._active.get(job.key) is job:
+                del self._active[job.key]
+
+    def _count(self, status):
+        return sum(job.status == status for job in self._jobs.values())
+
+    def _trim(self):
+        finished = [j for j in self._jobs.values() if j.done]
+        for job in finished[:max(0, len(finished) - FINISHED_JOBS_KEPT)]:
+            del self._jobs[job.id]
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def position(self, job):
+        """
+        1-based place of a queued job in the queue (0 once started).
+        """
+        if job.status != "queued":
+            return 0
+        with self._lock:
+            queued = [j.id for j in self._jobs.values() if j.status == "queued"]
+        return queued.index(job.id) + 1 if job.id in queued else 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "running": self._count("running"),
+                "queued": self._count("queued"),
+            }
+
+
+# ===============================
+# Session Subscriptions
+# ===============================
+def session_job(session, queue, key, fn, slot="risk_job"):
+    """
+    The job a UI session (e.g. st.session_state) waits on, kept in
+    session[slot]. Reused while its key matches; otherwise the old job
+    is left and fn is submitted under `key`. None once the session
+    cancelled the job for this key (until retry_session_job).
+    """
+    if session.get(slot + "_cancelled") == key:
+        return None
+    job = session.get(slot)
+    if job is not None and job.key == key:
+        return job
+
+    leave_session_job(session, queue, slot)
+    session.pop(slot + "_cancelled", None)
+    job = session[slot] = queue.submit(fn, key=key)
+    return job
+
+
+def leave_session_job(session, queue, slot="risk_job", cancelled=False):
+    """
+    Unsubscribes the session from its job, which is cancelled only
+    if no other session still waits for it. cancelled=True keeps
+    session_job from resubmitting the same key.
+    """
+    job = session.pop(slot, None)
+    if job is None:
+        return
+    queue.unsubscribe(job)
+    if cancelled:
+        session[slot + "_cancelled"] = job.key
+
+
+def retry_session_job(session, queue, slot="risk_job"):
+    """
+    Forgets a cancelled or failed job so the next session_job submits again.
+    """
+    session.pop(slot + "_cancelled", None)
+    leave_session_job(session, queue, slot)
+
+
+# Shared by every Streamlit session of the server process
+RISK_JOBS = JobQueue()
@@ -0,0 +1,141 @@
+"""
+Process-wide cache of loaded models, shared by every session.
+
+Models are keyed by the content hash of their file, so the same
+production baseline uploaded by several reviewers (under different
+temp names) is unpickled once. Eviction is least-recently-used
+under a byte budget estimated from the models' tree node counts, so
+a few large forests can stay warm without growing without bound.
+"""
+import os
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import joblib
+
+from analysis.hashing import file_digest
+
+DEFAULT_BUDGET_MB = int(os.environ.get("MODELGUARD_MODEL_CACHE_MB", 1024))
+
+# sklearn's Tree node record: children, feature, threshold, impurity,
+# sample counts and the missing-value flag, padded to 64 bytes
+TREE_NODE_BYTES = 64
+ESTIMATOR_OVERHEAD_BYTES = 1024
+
+
+def estimated_model_bytes(model, fallback=0):
+    """
+    Resident size of a fitted tree model (or ensemble of them) from
+    its node counts; `fallback` (e.g. the file size) for anything else.
+    """
+    estimators = getattr(model, "estimators_", None)
+    if estimators is None:
+        estimators = [model] if hasattr(model, "tree_") else None
+    if estimators is None:
+        return fallback or sys.getsizeof(model)
+
+    total = 0
+    for est in estimators:
+        # Gradient boosting keeps a 2-D array of trees
+        for tree in getattr(est, "ravel", lambda: [est])():
+            t = getattr(tree, "tree_", None)
+            if t is None:
+                # e.g. bagged linear models or a VotingClassifier
+                return fallback or sys.getsizeof(model)
+            value_bytes = t.value.shape[1] * t.value.shape[2] * t.value.itemsize
+            total += t.node_count * (TREE_NODE_BYTES + value_bytes) + ESTIMATOR_OVERHEAD_BYTES
+    return total
+
+
+class ModelCache:
+    """
+    Thread-safe LRU of loaded models bounded by estimated bytes.
+
+    Concurrent loads of the same file wait for one unpickling. A model
+    larger than the whole budget is returned but not kept.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_BUDGET_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def load(self, path):
+        key = file_digest(path)
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+
+            pending = self._loading.get(key)
+            if pending is None:
+                self.misses += 1
+                pending = self._loading[key] = Future()
+                owner = True
+            else:
+                self.hits += 1
+                owner = False
+
+        if not owner:
+            return pending.result()
+
+        # Whatever fails, waiters on `pending` must get an answer
+        try:
+            model = joblib.load(path)
+            size = estimated_model_bytes(model, fallback=os.path.getsize(path))
+            with self._lock:
+                del self._loading[key]
+                if size <= self.max_bytes:
+                    self._entries[key] = (model, size)
+                    self.total_bytes += size
+                    self._evict()
+        except BaseException as e:
+            with self._lock:
+                self._loading.pop(key, None)
+            pending.set_exception(e)
+            raise
+
+        pending.set_result(model)
+        return model
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and self._entries:
+            _, (_, size) = self._entries.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "resident_mb": self.total_bytes / 2**20,
+                "budget_mb": self.max_bytes / 2**20,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Shared by app.py, pages/results.py and the upload loaders
+MODEL_CACHE = ModelCache()
+
+
+def load_model(path, cache=MODEL_CACHE):
+    return cache.load(path) if cache is not None else joblib.load(path)
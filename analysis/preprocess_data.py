@@ -1,39 +1,89 @@
+import hashlib
+import json
+import os
+
+import numpy as np
 import pandas as pd
-import joblib
 from sklearn.model_selection import train_test_split
 
-def load_and_preprocess_data(file_path="data/wdbc.data"):
+from analysis.dataset_store import dataset_digest, is_dataset, open_dataset, save_dataset
+from analysis.hashing import file_digest
+from analysis.schema import FEATURE_NAMES, LABEL_ENCODING, RAW_COLUMNS, RAW_DTYPES
+
+PREPROCESS_VERSION = 2
+MANIFEST = "preprocess.json"
+
+
+def read_raw_data(file_path):
+    """
+    Parses data/wdbc.data with explicit dtypes.
+
+    Returns (X, y) with the canonical feature names and labels.
+    Out-of-core evaluation reads raw files with
+    analysis/streaming.csv_chunks instead; the split here needs the
+    whole file in memory anyway.
+    """
+    df = pd.read_csv(file_path, header=None, names=RAW_COLUMNS, dtype=RAW_DTYPES)
+
+    y = df["diagnosis"].map(LABEL_ENCODING)
+    if y.isna().any():
+        bad = sorted(set(df["diagnosis"][y.isna()].astype(str)))
+        raise ValueError(f"Unknown diagnosis values: {bad}")
+
+    return df[FEATURE_NAMES], y.astype(np.int64).rename("target")
+
+
+def preprocess_fingerprint(file_path, params):
+    payload = json.dumps({
+        "raw": file_digest(file_path),
+        "params": params,
+        "version": PREPROCESS_VERSION,
+        "features": FEATURE_NAMES,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def _cached_split(output_dir, fingerprint):
+    try:
+        with open(os.path.join(output_dir, MANIFEST)) as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+    if manifest.get("fingerprint") != fingerprint:
+        return None
+
+    splits = {}
+    for name in ("train", "test"):
+        path = os.path.join(output_dir, name)
+        if not is_dataset(path) or dataset_digest(path) != manifest["outputs"].get(name):
+            return None
+        splits[name] = open_dataset(path)[:2]
+
+    (X_train, y_train), (X_test, y_test) = splits["train"], splits["test"]
+    return X_train, X_test, y_train, y_test
+
+
+def load_and_preprocess_data(file_path="data/wdbc.data", output_dir="data",
+                             test_size=0.30, random_state=42, force=False):
     """
     Loads and preprocesses the Breast Cancer Wisconsin dataset
     for Automated Model Update Risk Assessment System.
+
+    Writes the train/test splits as datasets (analysis/dataset_store.py)
+    to <output_dir>/train and <output_dir>/test. The raw file and split
+    parameters are fingerprinted; when neither changed since the last
+    run the stored splits are returned without re-parsing.
     """
+    params = {"test_size": test_size, "random_state": random_state}
+    fingerprint = preprocess_fingerprint(file_path, params)
+
+    if not force:
+        cached = _cached_split(output_dir, fingerprint)
+        if cached is not None:
+            return cached
 
-    # Column names from wdbc.names
-    columns = [
-        "id", "diagnosis",
-        "mean_radius", "mean_texture", "mean_perimeter", "mean_area",
-        "mean_smoothness", "mean_compactness", "mean_concavity",
-        "mean_concave_points", "mean_symmetry", "mean_fractal_dimension",
-        "radius_error", "texture_error", "perimeter_error", "area_error",
-        "smoothness_error", "compactness_error", "concavity_error",
-        "concave_points_error", "symmetry_error", "fractal_dimension_error",
-        "worst_radius", "worst_texture", "worst_perimeter", "worst_area",
-        "worst_smoothness", "worst_compactness", "worst_concavity",
-        "worst_concave_points", "worst_symmetry", "worst_fractal_dimension"
-    ]
-
-    # Load dataset
-    df = pd.read_csv(file_path, header=None, names=columns)
-
-    # Convert target labels (M = 1, B = 0)
-    df["diagnosis"] = df["diagnosis"].map({"M": 1, "B": 0})
-
-    # Drop ID column
-    df.drop(columns=["id"], inplace=True)
-
-    # Separate features and target
-    X = df.drop(columns=["diagnosis"])
-    y = df["diagnosis"]
+    X, y = read_raw_data(file_path)
 
     # Handle missing values (safety step)
     X = X.fillna(X.mean())
@@ -42,19 +92,26 @@ def load_and_preprocess_data(file_path="data/wdbc.data"):
     X_train, X_test, y_train, y_test = train_test_split(
         X,
         y,
-        test_size=0.30,
-        random_state=42,
+        test_size=test_size,
+        random_state=random_state,
         stratify=y
     )
 
     # Save processed data for reuse across project
-    joblib.dump(X_train, "data/X_train.pkl")
-    joblib.dump(X_test, "data/X_test.pkl")
-    joblib.dump(y_train, "data/y_train.pkl")
-    joblib.dump(y_test, "data/y_test.pkl")
+    outputs = {
+        "train": save_dataset(os.path.join(output_dir, "train"), X_train, y_train)["fingerprint"],
+        "test": save_dataset(os.path.join(output_dir, "test"), X_test, y_test)["fingerprint"],
+    }
+    with open(os.path.join(output_dir, MANIFEST), "w") as f:
+        json.dump({"fingerprint": fingerprint, "params": params, "outputs": outputs},
+                  f, indent=2)
 
     print("Preprocessing completed successfully")
     print("Training shape:", X_train.shape)
     print("Testing shape:", X_test.shape)
 
     return X_train, X_test, y_train, y_test
+
+
+if __name__ == "__main__":
+    load_and_preprocess_data()
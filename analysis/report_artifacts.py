@@ -0,0 +1,361 @@
+"""
+Pre-rendered risk report artifacts.
+
+Once a risk report is computed, its component bar chart (PNG) and a
+self-contained HTML report (chart embedded, per-feature SHAP drift
+table, subgroup breakdowns) are rendered once per (model pair, data,
+options) key on a background thread and stored on disk. Reruns of
+the app serve the stored files instead of rebuilding matplotlib
+figures, and the same files can be downloaded or attached to a
+deployment ticket.
+
+Layout: <directory>/<key hash>/report.png and report.html
+"""
+import base64
+import hashlib
+import html
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+ARTIFACT_DIR = ".cache/report_artifacts"
+
+# Bump when the rendered layout changes so stale artifacts are not served
+ARTIFACT_VERSION = 1
+
+ARTIFACT_FILES = {"png": "report.png", "html": "report.html"}
+
+COMPONENT_LABELS = {
+    "flip_rate": "Flip",
+    "conf_shift": "Confidence",
+    "feature_drift": "Drift",
+    "subgroup_risk": "Subgroup",
+    "bias_severity": "Bias",
+}
+
+TOP_SUBGROUPS = 10
+
+# Rendering is a little pandas and one small figure; one thread keeps
+# it off the analysis workers without competing with them.
+_RENDERER = ThreadPoolExecutor(max_workers=1, thread_name_prefix="report-render")
+
+
+def artifact_key(cache_key):
+    """
+    Directory name for a risk_cache_key (analysis/result_cache.py).
+    """
+    h = hashlib.sha256(repr((ARTIFACT_VERSION, cache_key)).encode())
+    return h.hexdigest()[:32]
+
+
+# ===============================
+# Rendering
+# ===============================
+def component_chart(report):
+    """
+    PNG bytes of the risk component bar chart.
+    """
+    # Figure/Agg directly: pyplot's global state is not thread-safe
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    labels = list(COMPONENT_LABELS.values())
+    components = [report[name] or 0.0 for name in COMPONENT_LABELS]
+
+    fig = Figure(figsize=(8, 5))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+
+    bars = ax.bar(labels, components)
+
+    ax.set_ylim(0, max(components) + 0.02)
+    ax.set_title("Risk Component Distribution", fontsize=14)
+    ax.set_ylabel("Risk Score")
+
+    # Add value labels
+    for bar, value in zip(bars, (report[name] for name in COMPONENT_LABELS)):
+        ax.text(
+            bar.get_x() + bar.get_width()/2,
+            bar.get_height(),
+            "skipped" if value is None else f"{value:.3f}",
+            ha='center',
+            va='bottom'
+        )
+
+    ax.grid(axis='y', linestyle='--', alpha=0.4)
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=100, bbox_inches="tight")
+    return buf.getvalue()
+
+
+def report_tables(baseline_model, updated_model, X_test, y_test,
+                  feature="mean radius", cache=None, with_shap=True):
+    """
+    Tables of the HTML report: the per-feature SHAP drift table
+    (None without SHAP), the quantile breakdown of `feature` and the
+    worst quantile subgroups across all features.
+
+    Probabilities and |SHAP| sums come from `cache` (a SummaryCache),
+    so tables for a pair that was just evaluated cost no inference.
+    """
+    from analysis.inference import ensure_frame, inference_from_proba
+    from analysis.shap_drift import drift_table
+    from analysis.subgroup_risk import GROUP_LABELS
+    from analysis.subgroup_scan import scan_subgroups
+    from analysis.summary_cache import model_summaries
+
+    X_test = ensure_frame(X_test, baseline_model)
+    base, cand = model_summaries([baseline_model, updated_model], X_test,
+                                 cache=cache, with_shap=with_shap)
+    inference = inference_from_proba(baseline_model, updated_model,
+                                     base["proba"], cand["proba"])
+
+    drift = None
+    if with_shap:
+        n_rows = len(X_test)
+        drift = drift_table(base["shap_abs_sum"] / n_rows,
+                            cand["shap_abs_sum"] / n_rows, X_test.columns)
+
+    def scan(features):
+        return scan_subgroups(X_test, y_test, inference["pred_v1"],
+                              inference["pred_v2"], features=features,
+                              n_bins=len(GROUP_LABELS))
+
+    breakdown = scan([feature]).sort_values("bin", kind="stable")
+    breakdown.insert(1, "group", [GROUP_LABELS[b] for b in breakdown["bin"]])
+
+    return {
+        "drift": drift,
+        "breakdown": breakdown.drop(columns=["feature", "bin"]),
+        "worst_subgroups": scan(None).head(TOP_SUBGROUPS),
+    }
+
+
+def _table_html(df, float_format="{:.4f}".format):
+    return df.to_html(index=False, float_format=float_format, border=0,
+                      classes="table", na_rep="-")
+
+
+def report_html(report, tables, png, title="AI Risk Intelligence Report",
+                feature="mean radius"):
+    """
+    Self-contained HTML document (chart inlined as base64).
+    """
+    score = report["final_risk_score"]
+    rows = [
+        (label, report[name]) for name, label in (
+            ("flip_rate", "Prediction Flip Rate"),
+            ("conf_shift", "Confidence Shift"),
+            ("feature_drift", "Feature Drift"),
+            ("subgroup_risk", "Subgroup Risk"),
+            ("bias_severity", "Bias Severity Score"),
+            ("final_risk_score", "Final Risk Score"),
+        )
+    ]
+    components = "".join(
+        f"<tr><td>{label}</td><td>{'-' if value is None else f'{value:.4f}'}</td></tr>"
+        for label, value in rows
+    )
+
+    notes = []
+    interval = report.get("intervals", {}).get("final_risk_score")
+    if interval is not None:
+        notes.append(f"Bootstrap interval: [{interval['low']:.4f}, {interval['high']:.4f}]")
+    if report["drift_mode"] == "approximate":
+        low, high = report["drift_ci"]
+        notes.append(
+            f"Approximate drift: CI [{low:.4f}, {high:.4f}] "
+            f"from {report['drift_rows_used']} rows"
+        )
+    elif report["drift_mode"] == "skipped":
+        low, high = report["drift_ci"]
+        notes.append(
+            f"SHAP drift skipped: the decision holds for any drift in [{low:g}, {high:g}]"
+        )
+
+    if tables["drift"] is not None:
+        drift = _table_html(tables["drift"], "{:.6f}".format)
+    else:
+        drift = "<p>Not computed (exact SHAP was not run for this report).</p>"
+
+    sections = [
+        f"<h1>{html.escape(title)}</h1>",
+        f"<p class='decision'>Decision: <b>{html.escape(str(report['decision']))}</b>"
+        + ("" if score is None else f" &mdash; risk score {score:.4f}") + "</p>",
+        *(f"<p>{html.escape(note)}</p>" for note in notes),
+        "<h2>Risk Components</h2>",
+        f"<table class='table'>{components}</table>",
+        f"<img alt='Risk component chart' src='data:image/png;base64,"
+        f"{base64.b64encode(png).decode()}'>",
+        "<h2>SHAP Feature Drift</h2>",
+        drift,
+        f"<h2>Subgroups by {html.escape(feature)}</h2>",
+        _table_html(tables["breakdown"]),
+        f"<h2>Worst {TOP_SUBGROUPS} Subgroups (all features)</h2>",
+        _table_html(tables["worst_subgroups"]),
+        f"<p class='footer'>Generated {time.strftime('%Y-%m-%d %H:%M:%S')}</p>",
+    ]
+
+    return (
+        "<!DOCTYPE html>\n<html><head><meta charset='utf-8'>"
+        f"<title>{html.escape(title)}</title><style>"
+        "body{font-family:sans-serif;max-width:900px;margin:2em auto;color:#222}"
+        ".table{border-collapse:collapse;margin-bottom:1.5em}"
+        ".table td,.table th{padding:4px 10px;border-bottom:1px solid #ddd;text-align:right}"
+        ".table td:first-child,.table th:first-child{text-align:left}"
+        "img{max-width:100%}.footer{color:#888;font-size:small}"
+        "</style></head><body>\n"
+        + "\n".join(sections)
+        + "\n</body></html>\n"
+    )
+
+
+def render_report(report, baseline_model, updated_model, X_test, y_test,
+                  feature="mean radius", cache=None):
+    """
+    {"png": bytes, "html": bytes} for a finished risk report. The
+    drift table is only built when the report ran exact SHAP.
+    """
+    with_shap = report["drift_mode"] == "exact"
+    tables = report_tables(baseline_model, updated_model, X_test, y_test,
+                           feature=feature, cache=cache, with_shap=with_shap)
+    png = component_chart(report)
+    document = report_html(report, tables, png, feature=feature)
+    return {"png": png, "html": document.encode()}
+
+
+# ===============================
+# Artifact Store
+# ===============================
+class ArtifactStore:
+    """
+    Rendered artifacts on disk, one directory per artifact_key.
+
+    Directories are touched on every hit and evicted least-recently-used
+    once the total size exceeds max_bytes; the artifact just written is
+    always kept.
+    """
+
+    def __init__(self, directory=ARTIFACT_DIR, max_bytes=128 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def paths(self, key):
+        folder = os.path.join(self.directory, key)
+        return {kind: os.path.join(folder, name) for kind, name in ARTIFACT_FILES.items()}
+
+    def get(self, key):
+        """
+        Paths of the stored artifacts, or None unless all exist.
+        """
+        paths = self.paths(key)
+        if not all(os.path.exists(p) for p in paths.values()):
+            return None
+        try:
+            os.utime(os.path.dirname(paths["png"]))
+        except FileNotFoundError:
+            # Evicted between the check and the touch
+            return None
+        return paths
+
+    def put(self, key, artifacts):
+        paths = self.paths(key)
+        folder = os.path.dirname(paths["png"])
+        os.makedirs(folder, exist_ok=True)
+
+        # Write-then-rename so a concurrent reader never sees a partial file
+        for kind, path in paths.items():
+            fd, tmp = tempfile.mkstemp(dir=folder, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(artifacts[kind])
+            os.replace(tmp, path)
+        os.utime(folder)
+
+        self.evict(keep=key)
+        return paths
+
+    def entries(self):
+        """
+        (key, size, last access) for every stored artifact directory.
+        """
+        found = []
+        if not os.path.isdir(self.directory):
+            return found
+        for key in os.listdir(self.directory):
+            folder = os.path.join(self.directory, key)
+            try:
+                size = sum(os.path.getsize(os.path.join(folder, name))
+                           for name in os.listdir(folder))
+                found.append((key, size, os.stat(folder).st_mtime))
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+        return found
+
+    def evict(self, keep=None):
+        with self._lock:
+            entries = sorted(self.entries(), key=lambda e: e[2])
+            total = sum(size for _, size, _ in entries)
+            for key, size, _ in entries:
+                if total <= self.max_bytes:
+                    break
+                if key == keep:
+                    continue
+                shutil.rmtree(os.path.join(self.directory, key), ignore_errors=True)
+                total -= size
+
+
+ARTIFACTS = ArtifactStore()
+
+_pending = {}
+_pending_lock = threading.Lock()
+
+
+def render_in_background(cache_key, report, baseline_path, updated_path,
+                         X_path, y_path, feature="mean radius",
+                         summary_cache_dir=None, store=ARTIFACTS):
+    """
+    Future resolving to the artifact paths for this risk_cache_key.
+
+    Served from `store` when already rendered; otherwise rendered once
+    on the background thread, however many sessions ask for it.
+    """
+    key = artifact_key(cache_key)
+    paths = store.get(key)
+    if paths is not None:
+        done = Future()
+        done.set_result(paths)
+        return done
+
+    with _pending_lock:
+        pending = _pending.get(key)
+        if pending is not None:
+            return pending
+
+        def render():
+            try:
+                from analysis.dataset_store import load_features, load_labels
+                from analysis.model_cache import load_model
+                from analysis.summary_cache import SummaryCache
+
+                artifacts = render_report(
+                    report,
+                    load_model(baseline_path),
+                    load_model(updated_path),
+                    load_features(X_path),
+                    load_labels(y_path),
+                    feature=feature,
+                    cache=SummaryCache(summary_cache_dir) if summary_cache_dir else None
+                )
+                return store.put(key, artifacts)
+            finally:
+                with _pending_lock:
+                    _pending.pop(key, None)
+
+        pending = _pending[key] = _RENDERER.submit(render)
+        return pending
@@ -0,0 +1,139 @@
+import threading
+from collections import OrderedDict
+
+from analysis.dataset_store import load_features, load_labels
+from analysis.hashing import file_digest
+
+
+class ResultCache:
+    """
+    Bounded, thread-safe LRU cache for completed risk runs.
+
+    Keys are content hashes, so re-uploading the same model pair
+    (under a new temp file name) still hits.
+    """
+
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# Process-wide cache shared by app.py and pages/results.py
+RESULT_CACHE = ResultCache()
+
+# Directory of the persistent per-model summary cache
+SUMMARY_CACHE_DIR = ".cache/model_summaries"
+
+# Options of the Streamlit review (app.py and pages/results.py), kept
+# in one place so both pages hit the same RESULT_CACHE entries
+APP_REPORT_OPTIONS = {
+    "X_path": "data/test",
+    "y_path": "data/test",
+    "feature": "mean radius",
+    "drift_tol": 0.001,
+    "n_boot": 2000,
+}
+
+
+def risk_cache_key(baseline_path, updated_path, X_path, y_path,
+                   feature="mean radius", drift_mode="exact", drift_tol=None,
+                   n_boot=0):
+    return (
+        file_digest(baseline_path),
+        file_digest(updated_path),
+        file_digest(X_path),
+        file_digest(y_path),
+        feature,
+        drift_mode,
+        drift_tol if drift_mode != "exact" else None,
+        n_boot,
+    )
+
+
+def cached_risk_report(baseline_path, updated_path,
+                       X_path="data/test", y_path="data/test",
+                       feature="mean radius", drift_mode="exact",
+                       drift_tol=0.001, cache=RESULT_CACHE,
+                       summary_cache_dir=SUMMARY_CACHE_DIR, profiler=None,
+                       n_boot=0, models=None):
+    """
+    Returns the full risk report for a model pair, computing it
+    only when this (models, data) content has not been seen.
+
+    On a miss, per-model summaries come from the on-disk cache in
+    summary_cache_dir (None disables it), so only a new model pays
+    for inference and SHAP.
+
+    With a profiler, the returned report's "timings" describe this
+    call (only hashing and lookup on a hit). `models` may hold the
+    already loaded (baseline, updated) pair so a miss does not
+    unpickle the files again.
+    """
+    # Imported here so hashing a cache hit never touches shap/sklearn
+    from analysis.instrumentation import stage
+    from analysis.model_cache import load_model
+    from analysis.risk_pipeline import evaluate_risk
+    from analysis.summary_cache import SummaryCache
+
+    with stage(profiler, "hash_inputs"):
+        key = risk_cache_key(
+            baseline_path, updated_path, X_path, y_path,
+            feature, drift_mode, drift_tol, n_boot
+        )
+        report = cache.get(key)
+
+    if report is None:
+        if models is not None:
+            baseline_model, updated_model = models
+        else:
+            with stage(profiler, "model_load"):
+                baseline_model = load_model(baseline_path)
+                updated_model = load_model(updated_path)
+        with stage(profiler, "data_load"):
+            X_test = load_features(X_path)
+            y_test = load_labels(y_path)
+
+        report = evaluate_risk(
+            baseline_model,
+            updated_model,
+            X_test,
+            y_test,
+            feature=feature,
+            drift_mode=drift_mode,
+            drift_tol=drift_tol,
+            cache=SummaryCache(summary_cache_dir) if summary_cache_dir else None,
+            profiler=profiler,
+            n_boot=n_boot
+        )
+        report.pop("timings", None)
+        cache.put(key, report)
+
+    if profiler is not None:
+        report = {**report, "timings": profiler.summary()}
+    return report
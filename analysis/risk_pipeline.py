@@ -0,0 +1,329 @@
+import numpy as np
+
+from analysis.inference import inference_from_proba
+from analysis.instrumentation import checkpoint, stage
+from analysis.schema import validate_evaluation_data
+from analysis.summary_cache import model_summaries
+from analysis.drift import DEFAULT_DRIFT_TOL
+from analysis.compute_metrics import (
+    confidence_shift,
+    feature_drift,
+    prediction_flip_rate,
+)
+from analysis.subgroup_risk import compute_subgroup_risk, subgroup_codes
+from analysis.bias_severity import compute_bias_severity
+from analysis.subgroup_scan import scan_subgroups
+
+
+# ===============================
+# Risk Policy
+# ===============================
+RISK_WEIGHTS = {
+    "flip_rate": 0.30,
+    "conf_shift": 0.25,
+    "feature_drift": 0.20,
+    "subgroup_risk": 0.15,
+    "bias_severity": 0.10,
+}
+
+DEPLOY_THRESHOLD = 0.02
+REVIEW_THRESHOLD = 0.07
+
+
+def final_risk_score(components):
+    """
+    Weighted aggregation of the risk components (0 – 1 scale).
+    """
+    return sum(w * components[name] for name, w in RISK_WEIGHTS.items())
+
+
+DRIFT_BOUNDS = (0.0, 1.0)
+EARLY_EXIT_MODES = (None, "bounds", "approximate")
+
+
+def deployment_decision(risk_score):
+    """
+    Maps a final risk score to DEPLOY / REVIEW / ROLLBACK.
+    """
+    if risk_score < DEPLOY_THRESHOLD:
+        return "DEPLOY"
+    if risk_score < REVIEW_THRESHOLD:
+        return "REVIEW"
+    return "ROLLBACK"
+
+
+def subgroup_features(X_test, feature, scan_features=None):
+    """
+    Every column the subgroup metrics will bin.
+    """
+    if scan_features == "all":
+        return list(X_test.columns)
+    return [feature, *(scan_features or [])]
+
+
+def settled_decision(partial, drift_low, drift_high):
+    """
+    The decision if it is the same for every feature drift in
+    [drift_low, drift_high] given the other components, else None.
+
+    The score is increasing in drift and the decision is a step
+    function of the score, so checking both ends is enough.
+    """
+    low = final_risk_score({**partial, "feature_drift": drift_low})
+    high = final_risk_score({**partial, "feature_drift": drift_high})
+    decision = deployment_decision(low)
+    return (decision if decision == deployment_decision(high) else None), (low, high)
+
+
+# ===============================
+# Full Risk Run
+# ===============================
+def evaluate_risk(baseline_model, updated_model, X_test, y_test,
+                  feature="mean radius", drift_mode="exact",
+                  drift_tol=DEFAULT_DRIFT_TOL, n_jobs=1, cache=None,
+                  scan_features=None, n_bins=3, profiler=None,
+                  n_boot=0, confidence=0.95, decide_on="point",
+                  early_exit=None):
+    """
+    Runs every risk component for one baseline/candidate pair
+    and returns the components, final score and decision.
+
+    drift_mode="approximate" estimates SHAP drift on a stratified
+    sample until its interval is within drift_tol; use "exact"
+    for final sign-off. n_jobs > 1 spreads exact SHAP over cores.
+
+    With a SummaryCache, per-model probabilities and SHAP sums are
+    read from / written to disk, so a baseline seen before is never
+    re-explained.
+
+    scan_features (a list of columns, or "all") adds the worst
+    quantile subgroups across those features to the report.
+    A Profiler (analysis/instrumentation.py) records every stage.
+
+    n_boot > 0 adds bootstrap intervals for every component and the
+    final score (analysis/bootstrap.py); decide_on="upper" then bases
+    the decision on the interval's upper bound instead of the point
+    estimate.
+
+    early_exit="bounds" computes the cheap components first and skips
+    SHAP when the decision holds for any drift in DRIFT_BOUNDS, so it
+    never changes the decision. "approximate" additionally screens
+    with the approximate drift interval (95%) before running exact
+    SHAP. A screened decision differs from the exact one only when the
+    true drift lies outside that interval on the side of a decision
+    threshold: at most about 2.5% of the decisions it settles (normal
+    approximation). Those reports carry settled_by="approximate_ci";
+    use "bounds" or no early exit where that is not acceptable.
+    """
+    validate_evaluation_data(
+        X_test, y_test, [baseline_model, updated_model],
+        features=subgroup_features(X_test, feature, scan_features)
+    )
+
+    base, cand = model_summaries(
+        [baseline_model, updated_model],
+        X_test,
+        cache=cache,
+        with_shap=drift_mode == "exact" and early_exit is None,
+        n_jobs=n_jobs,
+        profiler=profiler
+    )
+
+    def shap_sums():
+        # Deferred SHAP for early exit, stored alongside the cached probabilities
+        b, c = model_summaries([baseline_model, updated_model], X_test,
+                               cache=cache, n_jobs=n_jobs,
+                               profiler=profiler)
+        return b["shap_abs_sum"], c["shap_abs_sum"]
+
+    return evaluate_from_summaries(
+        baseline_model,
+        updated_model,
+        base,
+        cand,
+        X_test,
+        y_test,
+        feature=feature,
+        drift_mode=drift_mode,
+        drift_tol=drift_tol,
+        n_jobs=n_jobs,
+        scan_features=scan_features,
+        n_bins=n_bins,
+        profiler=profiler,
+        n_boot=n_boot,
+        confidence=confidence,
+        decide_on=decide_on,
+        early_exit=early_exit,
+        shap_sums_fn=shap_sums if cache is not None else None
+    )
+
+
+def evaluate_from_summaries(baseline_model, updated_model, base, cand,
+                            X_test, y_test, feature="mean radius",
+                            drift_mode="exact", drift_tol=DEFAULT_DRIFT_TOL,
+                            n_jobs=1, scan_features=None, n_bins=3,
+                            top_subgroups=10, profiler=None, n_boot=0,
+                            confidence=0.95, decide_on="point",
+                            early_exit=None, shap_sums_fn=None):
+    """
+    Risk report from precomputed per-model summaries
+    (see analysis/summary_cache.model_summaries).
+
+    Drift is computed last. With early_exit, the report lists the
+    drift stages it did not need in "skipped_stages", the score range
+    that settled the decision in "final_risk_bounds", and how it was
+    settled in "settled_by" ("bounds", "approximate_ci" or "full").
+    If SHAP was skipped entirely, feature_drift and final_risk_score
+    are None and drift_mode is "skipped". Exact SHAP sums missing from the summaries come from
+    shap_sums_fn, or are computed directly.
+    """
+    if early_exit not in EARLY_EXIT_MODES:
+        raise ValueError(f"Unknown early exit mode: {early_exit!r}")
+    if early_exit is not None and n_boot > 0:
+        raise ValueError("early_exit cannot be combined with bootstrap intervals")
+    if decide_on not in ("point", "upper"):
+        raise ValueError(f"Unknown decision basis: {decide_on!r}")
+    if decide_on == "upper" and n_boot <= 0:
+        raise ValueError('decide_on="upper" requires n_boot > 0')
+
+    exact = drift_mode == "exact"
+    n_rows = len(X_test)
+    inference = inference_from_proba(
+        baseline_model, updated_model, base["proba"], cand["proba"]
+    )
+
+    with stage(profiler, "flip_confidence", rows=n_rows):
+        flip_rate = float(prediction_flip_rate(inference))
+        conf_shift = float(confidence_shift(inference))
+
+    with stage(profiler, "subgroup", rows=n_rows):
+        subgroup_risk = float(compute_subgroup_risk(
+            baseline_model,
+            updated_model,
+            X_test,
+            y_test,
+            feature=feature,
+            inference=inference
+        ))
+
+    with stage(profiler, "bias", rows=n_rows):
+        bias_severity = float(compute_bias_severity(
+            updated_model,
+            X_test,
+            y_test,
+            feature=feature,
+            proba=inference["proba_v2"]
+        ))
+
+    partial = {
+        "flip_rate": flip_rate,
+        "conf_shift": conf_shift,
+        "subgroup_risk": subgroup_risk,
+        "bias_severity": bias_severity,
+    }
+
+    settled_by = "full"
+    skipped = []
+    drift = None
+    decision = bounds = None
+
+    if early_exit is not None:
+        decision, bounds = settled_decision(partial, *DRIFT_BOUNDS)
+        if decision is not None:
+            settled_by = "bounds"
+            skipped = ["shap_drift"]
+            drift_mode = "skipped"
+            drift = {"drift": None, "ci_low": DRIFT_BOUNDS[0],
+                     "ci_high": DRIFT_BOUNDS[1], "rows_used": 0}
+
+    if drift is None and early_exit == "approximate" and exact:
+        with stage(profiler, "shap_drift_screen", rows=n_rows):
+            screen = feature_drift(
+                baseline_model, updated_model, X_test, mode="approximate",
+                tol=drift_tol, strata=np.asarray(y_test),
+                checkpoint=checkpoint(profiler)
+            )
+        decision, bounds = settled_decision(partial, screen["ci_low"], screen["ci_high"])
+        if decision is not None:
+            settled_by = "approximate_ci"
+            skipped = ["shap_drift"]
+            drift_mode = "approximate"
+            drift = screen
+
+    if drift is None:
+        with stage(profiler, "shap_drift", rows=n_rows):
+            shap_sums = None
+            if exact:
+                if "shap_abs_sum" in base and "shap_abs_sum" in cand:
+                    shap_sums = (base["shap_abs_sum"], cand["shap_abs_sum"])
+                elif shap_sums_fn is not None:
+                    shap_sums = shap_sums_fn()
+
+            drift = feature_drift(
+                baseline_model,
+                updated_model,
+                X_test,
+                mode=drift_mode,
+                tol=drift_tol,
+                strata=np.asarray(y_test),
+                n_jobs=n_jobs,
+                shap_sums=shap_sums,
+                checkpoint=checkpoint(profiler)
+            )
+
+    components = {**partial, "feature_drift": drift["drift"]}
+    components = {name: components[name] for name in RISK_WEIGHTS}
+
+    with stage(profiler, "final_scoring"):
+        score = None if drift["drift"] is None else final_risk_score(components)
+
+    report = {
+        **components,
+        "final_risk_score": score,
+        "decision": decision if score is None else deployment_decision(score),
+        "drift_mode": drift_mode,
+        "drift_ci": (drift["ci_low"], drift["ci_high"]),
+        "drift_rows_used": drift["rows_used"],
+    }
+
+    if early_exit is not None:
+        if bounds is None or settled_by == "full":
+            bounds = (score, score)
+        report["final_risk_bounds"] = bounds
+        report["settled_by"] = settled_by
+        report["skipped_stages"] = skipped
+
+    if n_boot > 0:
+        from analysis.bootstrap import bootstrap_risk
+
+        with stage(profiler, "bootstrap", rows=n_rows):
+            report["intervals"] = bootstrap_risk(
+                inference,
+                y_test,
+                subgroup_codes(X_test, feature),
+                drift["drift"],
+                n_boot=n_boot,
+                confidence=confidence
+            )
+        report["decision_basis"] = decide_on
+        if decide_on == "upper":
+            report["decision"] = deployment_decision(
+                report["intervals"]["final_risk_score"]["high"]
+            )
+
+    if scan_features is not None:
+        with stage(profiler, "subgroup_scan", rows=n_rows):
+            scan = scan_subgroups(
+                X_test,
+                y_test,
+                inference["pred_v1"],
+                inference["pred_v2"],
+                features=None if scan_features == "all" else scan_features,
+                n_bins=n_bins
+            )
+        report["worst_subgroups"] = scan.head(top_subgroups).to_dict("records")
+
+    if profiler is not None:
+        report["timings"] = profiler.summary()
+
+    return report
@@ -0,0 +1,278 @@
+"""
+Per-row inference results for incremental re-evaluation.
+
+When the evaluation set grows by appending rows, most of the work
+(probabilities, per-row |SHAP|) is already done. RowCache stores
+those per-row results for each model, keyed by a fingerprint of the
+row, so a re-run only scores and explains rows it has not seen.
+The aggregates are then rebuilt over the full set in the original
+row order, so the report matches a full recompute exactly.
+
+Layout: <directory>/<schema hash>/<model hash>/<field>.npz, each
+holding sorted unique row keys and the matching per-row values.
+Files are touched on every lookup and evicted least-recently-used
+once the directory exceeds its byte budget.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from analysis.drift import (
+    DEFAULT_CHUNK_ROWS,
+    DEFAULT_DRIFT_TOL,
+    abs_sums_from_rows,
+    parallel_shap_abs_rows,
+)
+from analysis.inference import ensure_frame
+from analysis.instrumentation import checkpoint, stage
+from analysis.risk_pipeline import evaluate_from_summaries, subgroup_features
+from analysis.schema import validate_evaluation_data
+from analysis.summary_cache import model_fingerprint
+
+ROW_CACHE_DIR = ".cache/row_summaries"
+ROW_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+
+
+# ===============================
+# Fingerprints
+# ===============================
+def row_fingerprints(X):
+    """
+    One uint64 per row over its index label and feature values.
+    """
+    return pd.util.hash_pandas_object(X, index=True).to_numpy()
+
+
+def schema_fingerprint(X):
+    h = hashlib.sha256()
+    h.update(repr([(str(c), str(t)) for c, t in X.dtypes.items()]).encode())
+    return h.hexdigest()[:16]
+
+
+# ===============================
+# Row Cache
+# ===============================
+class RowCache:
+    """
+    Per-row values ("proba", "shap_abs") of each model, keyed by
+    row fingerprint. Whole (model, field) files are evicted
+    least-recently-used once their total size exceeds max_bytes; the
+    file just written is always kept.
+    """
+
+    def __init__(self, directory=ROW_CACHE_DIR, max_bytes=ROW_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _path(self, schema_hash, model_hash, field):
+        return os.path.join(self.directory, schema_hash, model_hash, f"{field}.npz")
+
+    def _load(self, path):
+        try:
+            with np.load(path) as f:
+                stored = f["keys"], f["values"]
+            os.utime(path)
+        except (FileNotFoundError, OSError, ValueError, KeyError, zipfile.BadZipFile):
+            # Missing, evicted or truncated: those rows are recomputed
+            return None
+        return stored
+
+    def lookup(self, schema_hash, model_hash, field, keys):
+        """
+        (values, found): values for the rows whose key is stored, in
+        the order of `keys`, and the boolean mask of those rows.
+        """
+        stored = self._load(self._path(schema_hash, model_hash, field))
+        if stored is None or len(stored[0]) == 0:
+            return None, np.zeros(len(keys), dtype=bool)
+
+        stored_keys, stored_values = stored
+        pos = np.searchsorted(stored_keys, keys)
+        pos_clipped = np.minimum(pos, len(stored_keys) - 1)
+        found = (pos < len(stored_keys)) & (stored_keys[pos_clipped] == keys)
+        return stored_values[pos_clipped[found]], found
+
+    def update(self, schema_hash, model_hash, field, keys, values):
+        """
+        Merges new rows into the stored ones and rewrites the file
+        atomically.
+        """
+        path = self._path(schema_hash, model_hash, field)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with self._lock:
+            stored = self._load(path)
+            if stored is not None:
+                keys = np.concatenate([stored[0], keys])
+                values = np.concatenate([stored[1], values])
+            keys, first = np.unique(keys, return_index=True)
+            values = values[first]
+
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, keys=keys, values=values)
+            os.replace(tmp, path)
+
+            self._evict(keep=path)
+
+    def entries(self):
+        """
+        (path, size, last access) for every stored file.
+        """
+        found = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".npz"):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    found.append((path, st.st_size, st.st_mtime))
+        return found
+
+    def _evict(self, keep=None):
+        entries = sorted(self.entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+# ===============================
+# Incremental Summaries
+# ===============================
+def _fill(cache, schema_hash, model_hashes, field, keys, compute, row_shape=()):
+    """
+    Per-model (rows, ...) arrays for `field`, reusing stored rows and
+    computing only the missing ones via compute(models_idx, rows).
+    `row_shape` is the shape of one row's value, for an empty X.
+    """
+    if len(keys) == 0:
+        return [np.empty((0, *row_shape)) for _ in model_hashes], 0
+
+    results, missing = [], []
+    for model_hash in model_hashes:
+        values, found = cache.lookup(schema_hash, model_hash, field, keys)
+        results.append((values, found))
+        missing.append(np.flatnonzero(~found))
+
+    need = [i for i, rows in enumerate(missing) if len(rows)]
+    computed = compute(need, missing) if need else {}
+
+    out = []
+    for i, (values, found) in enumerate(results):
+        new = computed.get(i)
+        if new is not None:
+            cache.update(schema_hash, model_hashes[i], field,
+                         keys[missing[i]], new)
+        width = (values if values is not None else new).shape[1:]
+        full = np.empty((len(keys), *width))
+        if values is not None:
+            full[found] = values
+        if new is not None:
+            full[missing[i]] = new
+        out.append(full)
+
+    return out, sum(len(missing[i]) for i in need)
+
+
+def row_summaries(models, X, cache, with_shap=True, n_jobs=1,
+                  chunk_size=DEFAULT_CHUNK_ROWS, profiler=None):
+    """
+    Like summary_cache.model_summaries, but reusing per-row results:
+    only rows missing from `cache` are scored / explained.
+
+    Returns (summaries, rows_computed) where each summary holds
+    "proba" and, when with_shap, "shap_abs_sum" reduced in the same
+    chunk order as a full computation.
+    """
+    X = ensure_frame(X, models[0])
+    keys = row_fingerprints(X)
+    schema_hash = schema_fingerprint(X)
+    model_hashes = [model_fingerprint(m) for m in models]
+
+    def predict(need, missing):
+        with stage(profiler, "predict_proba", rows=sum(len(missing[i]) for i in need)):
+            return {i: models[i].predict_proba(X.iloc[missing[i]]) for i in need}
+
+    probas, computed = _fill(cache, schema_hash, model_hashes, "proba", keys, predict,
+                             row_shape=(len(models[0].classes_),))
+    summaries = [{"proba": p} for p in probas]
+    rows_computed = {"proba": computed}
+
+    if with_shap:
+        def explain(need, missing):
+            with stage(profiler, "shap_values", rows=sum(len(missing[i]) for i in need)):
+                # Rows missing for every model are explained in one batch
+                if all(np.array_equal(missing[need[0]], missing[i]) for i in need):
+                    rows = parallel_shap_abs_rows(
+                        [models[i] for i in need], X.iloc[missing[need[0]]],
+                        n_jobs=n_jobs, chunk_size=chunk_size,
+                        checkpoint=checkpoint(profiler)
+                    )
+                    return dict(zip(need, rows))
+                return {
+                    i: parallel_shap_abs_rows([models[i]], X.iloc[missing[i]],
+                                              n_jobs=n_jobs, chunk_size=chunk_size,
+                                              checkpoint=checkpoint(profiler))[0]
+                    for i in need
+                }
+
+        shap_rows, computed = _fill(cache, schema_hash, model_hashes, "shap_abs", keys,
+                                    explain, row_shape=(X.shape[1],))
+        for summary, rows in zip(summaries, shap_rows):
+            summary["shap_abs_sum"] = abs_sums_from_rows(rows, chunk_size)
+        rows_computed["shap_abs"] = computed
+
+    return summaries, rows_computed
+
+
+def incremental_risk(baseline_model, updated_model, X_test, y_test, cache,
+                     feature="mean radius", drift_mode="exact",
+                     drift_tol=DEFAULT_DRIFT_TOL, n_jobs=1, scan_features=None,
+                     n_bins=3, profiler=None, n_boot=0, confidence=0.95,
+                     decide_on="point"):
+    """
+    evaluate_risk over a growing evaluation set: per-row results of
+    rows seen in earlier runs come from `cache` (a RowCache), only new
+    rows are scored and explained. Subgroup edges and every aggregate
+    are re-derived over the full set, so the report is identical to a
+    full recompute. "rows_computed" counts, per field, the rows that
+    had to be computed (summed over both models).
+    """
+    if len(X_test) == 0:
+        raise ValueError("X_test has no rows to evaluate")
+
+    validate_evaluation_data(
+        X_test, y_test, [baseline_model, updated_model],
+        features=subgroup_features(X_test, feature, scan_features)
+    )
+
+    (base, cand), rows_computed = row_summaries(
+        [baseline_model, updated_model], X_test, cache,
+        with_shap=drift_mode == "exact", n_jobs=n_jobs, profiler=profiler
+    )
+
+    report = evaluate_from_summaries(
+        baseline_model, updated_model, base, cand, X_test, y_test,
+        feature=feature, drift_mode=drift_mode, drift_tol=drift_tol,
+        n_jobs=n_jobs, scan_features=scan_features, n_bins=n_bins,
+        profiler=profiler, n_boot=n_boot, confidence=confidence,
+        decide_on=decide_on
+    )
+    report["rows_computed"] = rows_computed
+    return report
@@ -0,0 +1,101 @@
+"""
+Canonical feature schema of the evaluation data.
+
+Feature names follow sklearn's breast-cancer dataset ("mean radius"),
+which is what the shipped models were fitted on; labels use its
+encoding (malignant = 0, benign = 1).
+"""
+import numpy as np
+import pandas as pd
+
+FEATURE_NAMES = [
+    "mean radius", "mean texture", "mean perimeter", "mean area",
+    "mean smoothness", "mean compactness", "mean concavity",
+    "mean concave points", "mean symmetry", "mean fractal dimension",
+    "radius error", "texture error", "perimeter error", "area error",
+    "smoothness error", "compactness error", "concavity error",
+    "concave points error", "symmetry error", "fractal dimension error",
+    "worst radius", "worst texture", "worst perimeter", "worst area",
+    "worst smoothness", "worst compactness", "worst concavity",
+    "worst concave points", "worst symmetry", "worst fractal dimension",
+]
+
+# data/wdbc.data layout: id, diagnosis, then the 30 features
+LABEL_ENCODING = {"M": 0, "B": 1}
+RAW_COLUMNS = ["id", "diagnosis", *FEATURE_NAMES]
+RAW_DTYPES = {"id": np.int64, "diagnosis": str,
+              **{f: np.float64 for f in FEATURE_NAMES}}
+
+
+def model_compatibility(model, feature_names, labels=None):
+    """
+    Reasons `model` cannot be evaluated on data with these columns
+    (in this order) and labels; an empty list when it can.
+    """
+    if not hasattr(model, "predict_proba"):
+        return [f"{type(model).__name__} has no predict_proba"]
+
+    problems = []
+    columns = [str(c) for c in feature_names]
+    n = getattr(model, "n_features_in_", None)
+    expected = getattr(model, "feature_names_in_", None)
+
+    if expected is not None:
+        expected = [str(c) for c in expected]
+        if columns != expected:
+            missing = [c for c in expected if c not in columns]
+            extra = [c for c in columns if c not in expected]
+            problems.append(
+                "Evaluation features do not match the model's: "
+                f"missing {missing}, unexpected {extra}"
+                + ("" if missing or extra else ", columns are in a different order")
+            )
+    elif n is not None and n != len(columns):
+        problems.append(f"Model expects {n} features, evaluation data has {len(columns)}")
+
+    classes = getattr(model, "classes_", None)
+    if labels is not None and classes is not None:
+        unknown = np.setdiff1d(np.unique(np.asarray(labels)), classes)
+        if len(unknown):
+            problems.append(
+                f"Labels {unknown.tolist()} are not model classes {classes.tolist()}"
+            )
+
+    return problems
+
+
+def validate_evaluation_data(X, y, models=(), features=()):
+    """
+    Checks the evaluation data once, up front, so a schema mismatch
+    fails with a readable message instead of deep inside predict_proba
+    or the subgroup binning:
+
+    - X and y have the same length
+    - X has exactly the columns (and order) every model was fitted on
+    - the subgroup features exist and are numeric
+    - y only holds classes the models know
+    """
+    if y is not None and len(X) != len(y):
+        raise ValueError(f"X has {len(X)} rows but y has {len(y)}")
+
+    if isinstance(X, pd.DataFrame):
+        columns = X.columns
+    else:
+        # ensure_frame names array columns after the first model
+        columns = getattr(models[0], "feature_names_in_", None) if models else None
+        if columns is None:
+            columns = [str(i) for i in range(X.shape[1])]
+
+    for model in models:
+        problems = model_compatibility(model, columns, y)
+        if problems:
+            raise ValueError(problems[0])
+
+    if not isinstance(X, pd.DataFrame):
+        return
+
+    for feature in features:
+        if feature not in X.columns:
+            raise ValueError(f"Subgroup feature {feature!r} is not in the evaluation data")
+        if not pd.api.types.is_numeric_dtype(X[feature]):
+            raise ValueError(f"Subgroup feature {feature!r} is not numeric")
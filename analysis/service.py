@@ -0,0 +1,369 @@
+"""
+Local risk-evaluation service.
+
+Keeps registered models and the evaluation dataset resident, runs
+risk evaluations on a worker pool off the event loop and coalesces
+concurrent identical requests into one computation. Per-model
+probabilities and SHAP sums go to the on-disk SummaryCache, so a
+baseline is explained once, not once per candidate.
+
+The worker pool is threads: concurrent requests overlap, but their
+Python-heavy stages share the GIL, so throughput of those stages is
+bounded by one core. SHAP, the dominant stage, can be spread over
+processes with --shap-jobs.
+
+    python -m analysis.service --port 8765 --model models/model_v0.pkl
+
+Endpoints (JSON):
+    GET  /health
+    GET  /models
+    POST /models       body: {"path": "..."} or raw .pkl bytes
+    POST /evaluate     body: {"baseline": id, "candidate": id, ...options}
+
+Uploaded models are unpickled, i.e. trusted code: the service binds
+to localhost by default and must not be exposed to untrusted clients.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import joblib
+
+from analysis.dataset_store import load_features, load_labels
+from analysis.result_cache import SUMMARY_CACHE_DIR, ResultCache
+from analysis.risk_pipeline import evaluate_risk
+from analysis.summary_cache import SummaryCache, model_fingerprint
+
+EVALUATE_OPTIONS = ("feature", "drift_mode", "drift_tol", "n_boot", "decide_on",
+                    "scan_features", "n_bins", "early_exit")
+
+
+# ===============================
+# Model Registry
+# ===============================
+class ModelRegistry:
+    """
+    Models kept in memory under their content fingerprint.
+    """
+
+    def __init__(self):
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def register(self, model):
+        model_id = model_fingerprint(model)
+        with self._lock:
+            self._models.setdefault(model_id, model)
+        return model_id
+
+    def register_path(self, path):
+        return self.register(joblib.load(path))
+
+    def register_bytes(self, data):
+        return self.register(joblib.load(io.BytesIO(data)))
+
+    def get(self, model_id):
+        with self._lock:
+            if model_id not in self._models:
+                raise KeyError(f"Unknown model id: {model_id}")
+            return self._models[model_id]
+
+    def ids(self):
+        with self._lock:
+            return list(self._models)
+
+
+# ===============================
+# Service Core
+# ===============================
+class RiskService:
+    """
+    Evaluation core, independent of the HTTP layer.
+
+    Identical requests that arrive while one is running share its
+    future; finished reports are kept in a bounded LRU. With a
+    SummaryCache, models already seen by an earlier evaluation are not
+    scored or explained again. shap_jobs > 1 runs each evaluation's
+    SHAP on a process pool of that size.
+    """
+
+    def __init__(self, X_test, y_test, max_workers=None, cache_size=256,
+                 summary_cache=None, shap_jobs=1):
+        self.X_test = X_test
+        self.y_test = y_test
+        self.summary_cache = summary_cache
+        self.shap_jobs = shap_jobs
+        self.registry = ModelRegistry()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or os.cpu_count())
+        self.results = ResultCache(maxsize=cache_size)
+        self.computed = 0
+        self.coalesced = 0
+        self._inflight = {}
+
+    async def evaluate(self, baseline_id, candidate_id, **options):
+        unknown = set(options) - set(EVALUATE_OPTIONS)
+        if unknown:
+            raise ValueError(f"Unknown options: {sorted(unknown)}")
+
+        key = (baseline_id, candidate_id, json.dumps(options, sort_keys=True))
+        report = self.results.get(key)
+        if report is not None:
+            return report
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        baseline = self.registry.get(baseline_id)
+        candidate = self.registry.get(candidate_id)
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            self.executor,
+            partial(evaluate_risk, baseline, candidate,
+                    self.X_test, self.y_test, cache=self.summary_cache,
+                    n_jobs=self.shap_jobs, **options),
+        )
+        self._inflight[key] = future
+        try:
+            report = await asyncio.shield(future)
+        finally:
+            self._inflight.pop(key, None)
+
+        self.computed += 1
+        self.results.put(key, report)
+        return report
+
+    async def register_path(self, path):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.registry.register_path, path)
+
+    async def register_bytes(self, data):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.registry.register_bytes, data)
+
+    def health(self):
+        return {
+            "status": "ok",
+            "models": len(self.registry.ids()),
+            "rows": len(self.X_test),
+            "computed": self.computed,
+            "coalesced": self.coalesced,
+            "cache_hits": self.results.hits,
+            "inflight": len(self._inflight),
+        }
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+# ===============================
+# HTTP Layer
+# ===============================
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error"}
+
+
+def _json_default(obj):
+    if hasattr(obj, "item"):
+        return obj.item()
+    if isinstance(obj, tuple):
+        return list(obj)
+    return str(obj)
+
+
+async def read_request(reader):
+    """
+    (method, path, headers, body) of one HTTP/1.1 request, or None at EOF.
+    """
+    line = await reader.readline()
+    if not line:
+        return None
+    method, path, _ = line.decode("latin-1").split(" ", 2)
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get("content-length", 0))
+    body = await reader.readexactly(length) if length else b""
+    return method, path, headers, body
+
+
+def write_response(writer, status, payload, keep_alive=True):
+    body = json.dumps(payload, default=_json_default).encode()
+    head = (
+        f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+        f"Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    writer.write(head.encode() + body)
+
+
+async def dispatch(service, method, path, headers, body):
+    if method == "GET" and path == "/health":
+        return 200, service.health()
+
+    if method == "GET" and path == "/models":
+        return 200, {"models": service.registry.ids()}
+
+    if method == "POST" and path == "/models":
+        if headers.get("content-type", "").startswith("application/json"):
+            model_id = await service.register_path(json.loads(body)["path"])
+        else:
+            model_id = await service.register_bytes(body)
+        return 200, {"id": model_id}
+
+    if method == "POST" and path == "/evaluate":
+        request = json.loads(body)
+        report = await service.evaluate(
+            request.pop("baseline"), request.pop("candidate"), **request
+        )
+        return 200, report
+
+    return 404, {"error": f"No route for {method} {path}"}
+
+
+async def handle_connection(service, reader, writer):
+    try:
+        while True:
+            request = await read_request(reader)
+            if request is None:
+                break
+            method, path, headers, body = request
+            try:
+                status, payload = await dispatch(service, method, path, headers, body)
+            except (KeyError, ValueError, json.JSONDecodeError) as e:
+                status, payload = 400, {"error": str(e)}
+            except Exception as e:
+                status, payload = 500, {"error": str(e)}
+
+            keep_alive = headers.get("connection", "").lower() != "close"
+            write_response(writer, status, payload, keep_alive)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_server(service, host="127.0.0.1", port=8765):
+    return await asyncio.start_server(
+        partial(handle_connection, service), host, port
+    )
+
+
+# ===============================
+# Stand-in Client
+# ===============================
+class RiskServiceClient:
+    """
+    Minimal keep-alive HTTP client for the service (tests, scripts,
+    or as a stand-in for the deployment orchestrator).
+    """
+
+    def __init__(self, host="127.0.0.1", port=8765):
+        self.host = host
+        self.port = port
+        self._reader = self._writer = None
+
+    async def _request(self, method, path, body=b"", content_type="application/json"):
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        self._writer.write((
+            f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+            f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n\r\n"
+        ).encode() + body)
+        await self._writer.drain()
+
+        status_line = await self._reader.readline()
+        status = int(status_line.split()[1])
+        headers = {}
+        while (line := await self._reader.readline()) not in (b"\r\n", b""):
+            name, _, value = line.decode().partition(":")
+            headers[name.strip().lower()] = value.strip()
+        payload = json.loads(await self._reader.readexactly(int(headers["content-length"])))
+
+        if status != 200:
+            raise RuntimeError(f"{status}: {payload.get('error')}")
+        return payload
+
+    async def health(self):
+        return await self._request("GET", "/health")
+
+    async def register_path(self, path):
+        return (await self._request("POST", "/models", json.dumps({"path": path}).encode()))["id"]
+
+    async def register_bytes(self, data):
+        return (await self._request("POST", "/models", data, "application/octet-stream"))["id"]
+
+    async def evaluate(self, baseline, candidate, **options):
+        body = json.dumps({"baseline": baseline, "candidate": candidate, **options})
+        return await self._request("POST", "/evaluate", body.encode())
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            await self._writer.wait_closed()
+            self._reader = self._writer = None
+
+
+# ===============================
+# CLI
+# ===============================
+async def serve(args):
+    service = RiskService(
+        load_features(args.X_test),
+        load_labels(args.y_test),
+        max_workers=args.workers,
+        summary_cache=SummaryCache(args.cache_dir) if args.cache_dir else None,
+        shap_jobs=args.shap_jobs
+    )
+    for path in args.model:
+        print(f"registered {path} as {await service.register_path(path)}")
+
+    server = await start_server(service, args.host, args.port)
+    print(f"serving on http://{args.host}:{args.port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local risk-evaluation service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="concurrent evaluations (threads; see module docstring)")
+    parser.add_argument("--shap-jobs", type=int, default=1,
+                        help="processes for the SHAP stage of each evaluation")
+    parser.add_argument("--cache-dir", default=SUMMARY_CACHE_DIR,
+                        help="per-model summary cache directory ('' disables it)")
+    parser.add_argument("--X-test", default="data/test")
+    parser.add_argument("--y-test", default="data/test")
+    parser.add_argument("--model", action="append", default=[],
+                        help="model .pkl to register at startup (repeatable)")
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,63 +1,61 @@
 import joblib
-import shap
 import numpy as np
 import pandas as pd
 
-# Load test data
-X_test = joblib.load("data/X_test.pkl")
+from analysis.inference import ensure_frame
+from analysis.summary_cache import model_summaries
 
-# Load models
-model_v1 = joblib.load("models/model_v1.pkl")
-model_v2 = joblib.load("models/model_v2.pkl")
 
-# Ensure X_test is a DataFrame with correct feature names
-if not isinstance(X_test, pd.DataFrame):
-    feature_names = model_v1.feature_names_in_
-    X_test = pd.DataFrame(X_test, columns=feature_names)
-else:
-    feature_names = X_test.columns.to_list()
+def drift_table(importance_v1, importance_v2, feature_names):
+    """
+    Per-feature mean |SHAP| of both models and their absolute
+    difference, most drifted feature first.
+    """
+    importance_v1 = np.asarray(importance_v1)
+    importance_v2 = np.asarray(importance_v2)
+    if not len(importance_v1) == len(importance_v2) == len(feature_names):
+        raise ValueError("Feature mismatch between the SHAP importances")
 
-# Create SHAP explainers
-explainer_v1 = shap.TreeExplainer(model_v1)
-explainer_v2 = shap.TreeExplainer(model_v2)
+    return pd.DataFrame({
+        "Feature": list(feature_names),
+        "Importance_v1": importance_v1,
+        "Importance_v2": importance_v2,
+        "Drift": np.abs(importance_v1 - importance_v2)
+    }).sort_values(by="Drift", ascending=False, kind="stable")
 
-# ---- SAFE SHAP VALUE EXTRACTION ----
-def get_shap_values(explainer, X):
-    shap_vals = explainer.shap_values(X)
 
-    # Case 1: list (one array per class)
-    if isinstance(shap_vals, list):
-        return shap_vals[1]  # positive class
+def shap_drift_table(model_v1, model_v2, X_test, cache=None, n_jobs=1):
+    """
+    drift_table of two models on X_test. The |SHAP| sums come from
+    the summary cache when a SummaryCache is given (and are stored
+    there otherwise), so a pair that was just evaluated is not
+    explained again. The mean of "Drift" is the feature drift score.
+    """
+    X_test = ensure_frame(X_test, model_v1)
+    base, cand = model_summaries([model_v1, model_v2], X_test,
+                                 cache=cache, n_jobs=n_jobs)
+    n_rows = len(X_test)
+    return drift_table(base["shap_abs_sum"] / n_rows,
+                       cand["shap_abs_sum"] / n_rows,
+                       X_test.columns)
 
-    # Case 2: single array (samples, features, classes)
-    if shap_vals.ndim == 3:
-        return shap_vals[:, :, 1]
 
-    raise ValueError("Unexpected SHAP output format")
+def main():
+    from analysis.dataset_store import load_features
 
-# Compute SHAP values safely
-shap_v1 = get_shap_values(explainer_v1, X_test)
-shap_v2 = get_shap_values(explainer_v2, X_test)
+    X_test = load_features("data/test")
+    model_v1 = joblib.load("models/model_v1.pkl")
+    model_v2 = joblib.load("models/model_v2.pkl")
 
-# Mean absolute SHAP values per feature
-mean_shap_v1 = np.mean(np.abs(shap_v1), axis=0)
-mean_shap_v2 = np.mean(np.abs(shap_v2), axis=0)
+    drift_df = shap_drift_table(model_v1, model_v2, X_test)
 
-# Sanity check (VERY IMPORTANT)
-assert len(mean_shap_v1) == len(feature_names), "Feature mismatch in v1"
-assert len(mean_shap_v2) == len(feature_names), "Feature mismatch in v2"
+    # Feature importance drift score
+    feature_drift_score = drift_df["Drift"].mean()
+    print("Feature Importance Drift Score:", round(feature_drift_score, 6))
 
-# Feature importance drift score
-feature_drift_score = np.mean(np.abs(mean_shap_v1 - mean_shap_v2))
-print("Feature Importance Drift Score:", round(feature_drift_score, 6))
+    print("\nTop 10 Drifted Features:")
+    print(drift_df.head(10))
 
-# Create drift DataFrame (NOW GUARANTEED SAFE)
-drift_df = pd.DataFrame({
-    "Feature": feature_names,
-    "Importance_v1": mean_shap_v1,
-    "Importance_v2": mean_shap_v2,
-    "Drift": np.abs(mean_shap_v1 - mean_shap_v2)
-}).sort_values(by="Drift", ascending=False)
 
-print("\nTop 10 Drifted Features:")
-print(drift_df.head(10))
+if __name__ == "__main__":
+    main()
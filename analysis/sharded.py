@@ -0,0 +1,101 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from analysis.drift import tree_explainer
+from analysis.inference import ensure_frame
+from analysis.streaming import (
+    RiskAccumulator,
+    accumulator_report,
+    bin_codes,
+    chunk_statistics,
+)
+from analysis.subgroup_risk import GROUP_LABELS
+
+DEFAULT_SHARD_ROWS = 10_000
+
+
+# ===============================
+# Worker Side
+# ===============================
+# Models (and explainers) are loaded once per worker process by the
+# pool initializer; shards only carry rows.
+_WORKER = {}
+
+
+def _init_worker(baseline, updated, with_shap):
+    baseline = joblib.load(baseline) if isinstance(baseline, str) else baseline
+    updated = joblib.load(updated) if isinstance(updated, str) else updated
+    _WORKER["models"] = (baseline, updated)
+    _WORKER["explainers"] = (
+        (tree_explainer(baseline), tree_explainer(updated)) if with_shap else None
+    )
+
+
+def _shard_statistics(X, y, codes):
+    baseline, updated = _WORKER["models"]
+    return chunk_statistics(
+        baseline, updated, X, y, codes, explainers=_WORKER["explainers"]
+    )
+
+
+# ===============================
+# Map-Reduce Driver
+# ===============================
+def sharded_risk(baseline, updated, X_test, y_test, feature="mean radius",
+                 n_workers=None, shard_rows=DEFAULT_SHARD_ROWS, with_shap=True):
+    """
+    Risk evaluation split into fixed-size row shards processed by a
+    pool of worker processes.
+
+    baseline/updated may be fitted models or .pkl paths (paths are
+    loaded inside each worker). Each worker returns a RiskAccumulator
+    per shard: flip count, |delta proba| sum, subgroup correct counts
+    and SHAP sums. Partials are merged in shard order.
+
+    Shard boundaries depend only on shard_rows, so the output is
+    bit-for-bit identical for any n_workers. Count-based components
+    (flip rate, subgroup risk, bias severity) equal evaluate_risk
+    exactly; conf_shift and feature_drift are summed shard by shard
+    rather than in one pass and agree to a relative 1e-12
+    (tests/test_sharded_parity.py).
+    """
+    # Nothing to shard: fail here rather than in qcut or the pool
+    if len(X_test) == 0:
+        raise ValueError("X_test has no rows to evaluate")
+
+    if isinstance(X_test, pd.DataFrame):
+        feature_values = X_test[feature].to_numpy()
+    else:
+        model = joblib.load(baseline) if isinstance(baseline, str) else baseline
+        X_test = ensure_frame(X_test, model)
+        feature_values = X_test[feature].to_numpy()
+
+    # Subgroup edges are global, so they are fixed before sharding
+    _, edges = pd.qcut(feature_values, len(GROUP_LABELS), retbins=True)
+    codes = bin_codes(feature_values, edges)
+    y_test = pd.Series(np.asarray(y_test))
+
+    shards = [
+        (X_test.iloc[start:start + shard_rows],
+         y_test.iloc[start:start + shard_rows],
+         codes[start:start + shard_rows])
+        for start in range(0, len(X_test), shard_rows)
+    ]
+
+    n_workers = max(1, min(n_workers or os.cpu_count() or 1, len(shards)))
+    with ProcessPoolExecutor(
+        max_workers=n_workers,
+        initializer=_init_worker,
+        initargs=(baseline, updated, with_shap),
+    ) as pool:
+        partials = list(pool.map(_shard_statistics, *zip(*shards)))
+
+    acc = RiskAccumulator(X_test.shape[1])
+    for part in partials:
+        acc.merge(part)
+
+    return accumulator_report(acc)
@@ -0,0 +1,254 @@
+import numpy as np
+import pandas as pd
+
+from analysis.drift import class1_shap, drift_from_sums, tree_explainer
+from analysis.inference import labels_from_proba
+from analysis.risk_pipeline import deployment_decision, final_risk_score
+from analysis.schema import LABEL_ENCODING
+from analysis.subgroup_risk import GROUP_LABELS, MIN_GROUP_SIZE
+
+DEFAULT_CHUNK_SIZE = 50_000
+
+# data/wdbc.data labels in the encoding of the shipped models
+WDBC_LABELS = LABEL_ENCODING
+
+
+# ===============================
+# Mergeable Accumulator
+# ===============================
+class RiskAccumulator:
+    """
+    Sufficient statistics for every risk component.
+
+    Counts are exact integers; probability and SHAP sums are float64.
+    Accumulators over disjoint chunks can be merged, so the same
+    object serves streaming (update chunk by chunk) and sharded
+    (merge partial results) evaluation.
+    """
+
+    def __init__(self, n_features, n_groups=len(GROUP_LABELS)):
+        self.n_rows = 0
+        self.n_classes = None
+        self.flips = 0
+        self.abs_proba_diff_sum = 0.0
+        self.correct_v2 = 0
+        self.group_sizes = np.zeros(n_groups, dtype=np.int64)
+        self.group_correct_v1 = np.zeros(n_groups, dtype=np.int64)
+        self.group_correct_v2 = np.zeros(n_groups, dtype=np.int64)
+        self.shap_sum_v1 = np.zeros(n_features)
+        self.shap_sum_v2 = np.zeros(n_features)
+        self.has_shap = True
+
+    def update(self, proba_v1, proba_v2, pred_v1, pred_v2, y_true, codes,
+               shap_abs_v1=None, shap_abs_v2=None):
+        """
+        Adds one chunk. codes are subgroup bin codes (-1 = missing).
+        shap_abs_* are per-row |SHAP| arrays for the chunk, or None.
+        """
+        y_true = np.asarray(y_true)
+        n_groups = len(self.group_sizes)
+        correct_v1 = pred_v1 == y_true
+        correct_v2 = pred_v2 == y_true
+        valid = codes >= 0
+
+        self.n_rows += len(y_true)
+        self.n_classes = proba_v1.shape[1]
+        self.flips += int(np.count_nonzero(pred_v1 != pred_v2))
+        self.abs_proba_diff_sum += float(np.abs(proba_v1 - proba_v2).sum())
+        self.correct_v2 += int(np.count_nonzero(correct_v2))
+
+        self.group_sizes += np.bincount(codes[valid], minlength=n_groups)
+        self.group_correct_v1 += np.bincount(
+            codes[valid & correct_v1], minlength=n_groups)
+        self.group_correct_v2 += np.bincount(
+            codes[valid & correct_v2], minlength=n_groups)
+
+        if shap_abs_v1 is None or shap_abs_v2 is None:
+            self.has_shap = False
+        else:
+            self.shap_sum_v1 += shap_abs_v1.sum(axis=0)
+            self.shap_sum_v2 += shap_abs_v2.sum(axis=0)
+
+    def merge(self, other):
+        self.n_rows += other.n_rows
+        self.n_classes = self.n_classes or other.n_classes
+        self.flips += other.flips
+        self.abs_proba_diff_sum += other.abs_proba_diff_sum
+        self.correct_v2 += other.correct_v2
+        self.group_sizes += other.group_sizes
+        self.group_correct_v1 += other.group_correct_v1
+        self.group_correct_v2 += other.group_correct_v2
+        self.shap_sum_v1 += other.shap_sum_v1
+        self.shap_sum_v2 += other.shap_sum_v2
+        self.has_shap = self.has_shap and other.has_shap
+        return self
+
+    def components(self):
+        """
+        Risk components with the same definitions as compute_metrics,
+        compute_subgroup_risk and compute_bias_severity.
+        """
+        n = self.n_rows
+        sizes = self.group_sizes
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            acc1 = self.group_correct_v1 / sizes
+            acc2 = self.group_correct_v2 / sizes
+        eligible = sizes >= MIN_GROUP_SIZE
+
+        overall_acc2 = self.correct_v2 / n
+        subgroup_drops = [overall_acc2 - a for a in acc2[eligible]]
+
+        return {
+            "flip_rate": self.flips / n,
+            "conf_shift": self.abs_proba_diff_sum / (n * self.n_classes),
+            "feature_drift": (
+                float(drift_from_sums(self.shap_sum_v1, self.shap_sum_v2, n))
+                if self.has_shap else None
+            ),
+            "subgroup_risk": float(max([0, *(acc1 - acc2)[eligible]])),
+            "bias_severity": float(max(subgroup_drops)),
+        }
+
+
+# ===============================
+# Chunk Sources
+# ===============================
+def csv_chunks(path, feature_names, chunksize=DEFAULT_CHUNK_SIZE,
+               label_map=WDBC_LABELS):
+    """
+    Reads a wdbc.data style CSV (id, diagnosis, features...) in chunks.
+
+    Returns a callable producing a fresh iterator of (X, y) chunks,
+    since the streaming evaluator reads the source twice.
+    """
+    feature_names = list(feature_names)
+    names = ["id", "diagnosis", *feature_names]
+    dtypes = {"id": np.int64, "diagnosis": str,
+              **{f: np.float64 for f in feature_names}}
+
+    def chunks():
+        reader = pd.read_csv(path, header=None, names=names, dtype=dtypes,
+                             chunksize=chunksize)
+        for df in reader:
+            yield df[feature_names], df["diagnosis"].map(label_map)
+
+    return chunks
+
+
+def parquet_chunks(path, feature_names, target="target",
+                   chunksize=DEFAULT_CHUNK_SIZE):
+    """
+    Reads a Parquet file in record batches (requires pyarrow).
+    """
+    import pyarrow.parquet as pq
+
+    feature_names = list(feature_names)
+
+    def chunks():
+        pf = pq.ParquetFile(path)
+        for batch in pf.iter_batches(batch_size=chunksize,
+                                     columns=[*feature_names, target]):
+            df = batch.to_pandas()
+            yield df[feature_names], df[target]
+
+    return chunks
+
+
+def frame_chunks(X, y, chunksize=DEFAULT_CHUNK_SIZE):
+    """
+    Chunks of an in-memory frame (mainly for parity checks).
+    """
+    def chunks():
+        for start in range(0, len(X), chunksize):
+            yield X.iloc[start:start + chunksize], y.iloc[start:start + chunksize]
+
+    return chunks
+
+
+# ===============================
+# Streaming Evaluation
+# ===============================
+def subgroup_edges(chunks, feature):
+    """
+    Exact tercile edges of one feature, from a pass that keeps only
+    that column (8 bytes per row) in memory.
+    """
+    column = np.concatenate([X[feature].to_numpy() for X, _ in chunks()])
+    _, edges = pd.qcut(column, len(GROUP_LABELS), retbins=True)
+    return edges
+
+
+def bin_codes(values, edges):
+    """
+    Same bin assignment as pd.qcut with the given edges.
+    """
+    codes = pd.cut(values, edges, labels=False, include_lowest=True)
+    return np.where(np.isnan(codes), -1, codes).astype(int)
+
+
+def chunk_statistics(baseline_model, updated_model, X, y, codes,
+                     explainers=None, acc=None):
+    """
+    Adds one chunk's statistics to `acc` (a new accumulator when None).
+    explainers is a (baseline, candidate) TreeExplainer pair, or None
+    to skip SHAP.
+    """
+    if acc is None:
+        acc = RiskAccumulator(baseline_model.n_features_in_)
+
+    proba_v1 = baseline_model.predict_proba(X)
+    proba_v2 = updated_model.predict_proba(X)
+    acc.update(
+        proba_v1,
+        proba_v2,
+        labels_from_proba(baseline_model, proba_v1),
+        labels_from_proba(updated_model, proba_v2),
+        y,
+        codes,
+        np.abs(class1_shap(explainers[0], X)) if explainers else None,
+        np.abs(class1_shap(explainers[1], X)) if explainers else None,
+    )
+    return acc
+
+
+def accumulator_report(acc):
+    """
+    Components plus final score and decision (when drift is known).
+    """
+    components = acc.components()
+    report = dict(components)
+    if components["feature_drift"] is not None:
+        report["final_risk_score"] = final_risk_score(components)
+        report["decision"] = deployment_decision(report["final_risk_score"])
+    report["rows"] = acc.n_rows
+    return report
+
+
+def stream_risk(baseline_model, updated_model, chunks, feature="mean radius",
+                with_shap=True, edges=None):
+    """
+    Out-of-core risk evaluation.
+
+    `chunks` is a callable returning an iterator of (X, y) chunks
+    (see csv_chunks / parquet_chunks / frame_chunks). Memory is
+    bounded by the chunk size; the subgroup edges need one extra
+    pass over the subgroup column unless `edges` are supplied.
+    Components match evaluate_risk as described in sharded_risk.
+    """
+    if edges is None:
+        edges = subgroup_edges(chunks, feature)
+
+    explainers = None
+    if with_shap:
+        explainers = (tree_explainer(baseline_model), tree_explainer(updated_model))
+
+    acc = RiskAccumulator(baseline_model.n_features_in_)
+    for X, y in chunks():
+        chunk_statistics(
+            baseline_model, updated_model, X, y,
+            bin_codes(X[feature].to_numpy(), edges),
+            explainers=explainers, acc=acc
+        )
+
+    return accumulator_report(acc)
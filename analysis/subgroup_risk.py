@@ -1,22 +1,46 @@
-import pandas as pd
 import numpy as np
 
-def compute_subgroup_risk(model_v1, model_v2, X_test, y_test, feature):
-    df = X_test.copy()
-    df["true"] = y_test.values
+from analysis.inference import group_accuracies, run_inference
+from analysis.subgroup_scan import MIN_GROUP_SIZE, quantile_bins
 
-    df["group"] = pd.qcut(df[feature], 3, labels=["Low", "Medium", "High"])
+GROUP_LABELS = ["Low", "Medium", "High"]
+
+
+def subgroup_codes(X_test, feature):
+    """
+    Tercile codes (0=Low, 1=Medium, 2=High, -1=missing) for one feature,
+    identical to pd.qcut(X_test[feature], 3).
+    """
+    codes, edges, unique = quantile_bins(X_test, [feature], len(GROUP_LABELS))
+    if not unique[0]:
+        raise ValueError(
+            f"Bin edges must be unique for subgroup feature {feature!r}: "
+            f"{edges[0].tolist()}"
+        )
+    return codes[:, 0]
 
-    max_drop = 0
-    for g in ["Low", "Medium", "High"]:
-        sub = df[df["group"] == g]
-        if len(sub) < 10:
-            continue
 
-        Xg = sub.drop(columns=["true", "group"])
-        acc1 = np.mean(model_v1.predict(Xg) == sub["true"])
-        acc2 = np.mean(model_v2.predict(Xg) == sub["true"])
+def compute_subgroup_risk(model_v1, model_v2, X_test, y_test, feature,
+                          inference=None):
+    if inference is None:
+        inference = run_inference(model_v1, model_v2, X_test)
 
-        max_drop = max(max_drop, acc1 - acc2)
+    y_true = np.asarray(y_test)
+    codes = subgroup_codes(X_test, feature)
+    valid = codes >= 0
+
+    n_groups = len(GROUP_LABELS)
+    acc1, sizes = group_accuracies(
+        (inference["pred_v1"] == y_true)[valid], codes[valid], n_groups
+    )
+    acc2, _ = group_accuracies(
+        (inference["pred_v2"] == y_true)[valid], codes[valid], n_groups
+    )
+
+    max_drop = 0
+    for g in range(n_groups):
+        if sizes[g] < MIN_GROUP_SIZE:
+            continue
+        max_drop = max(max_drop, acc1[g] - acc2[g])
 
     return max_drop
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+
+# Subgroups smaller than this are ignored by every subgroup metric
+MIN_GROUP_SIZE = 10
+
+
+# ===============================
+# Bin Assignment
+# ===============================
+def quantile_bins(X, features, n_bins=3):
+    """
+    Quantile bin codes for many features at once.
+
+    Edges are computed in one call for all columns, the same way
+    pd.qcut does (linear quantiles); values fall into right-closed
+    bins with the lowest edge included. Missing values get code -1.
+
+    Returns (codes of shape (rows, features), edges of shape
+    (features, n_bins + 1), mask of features whose edges are unique).
+    """
+    values = X[list(features)].to_numpy(dtype=np.float64)
+    quantiles = np.linspace(0, 1, n_bins + 1)
+    # pd.qcut rounds quantiles up when they are not exact in base 2
+    np.putmask(
+        quantiles,
+        n_bins * quantiles != np.arange(n_bins + 1),
+        np.nextafter(quantiles, 1),
+    )
+    edges = np.nanquantile(values, quantiles, axis=0).T
+
+    unique = np.all(np.diff(edges, axis=1) > 0, axis=1)
+    codes = np.empty(values.shape, dtype=np.int64)
+    for j in range(values.shape[1]):
+        codes[:, j] = np.searchsorted(edges[j, 1:-1], values[:, j], side="left")
+    codes[np.isnan(values)] = -1
+
+    return codes, edges, unique
+
+
+# ===============================
+# Grouped Accuracy Scan
+# ===============================
+def grouped_accuracy(correct, codes, n_bins):
+    """
+    Per (feature, bin) size and accuracy from one bincount over
+    the flattened (rows, features) code matrix.
+    """
+    n_features = codes.shape[1]
+    flat = codes + np.arange(n_features) * n_bins
+    valid = codes >= 0
+    weights = np.broadcast_to(correct[:, None], codes.shape)
+
+    sizes = np.bincount(flat[valid], minlength=n_features * n_bins)
+    hits = np.bincount(flat[valid], weights=weights[valid],
+                       minlength=n_features * n_bins)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        acc = hits / sizes
+
+    return acc.reshape(n_features, n_bins), sizes.reshape(n_features, n_bins)
+
+
+def scan_subgroups(X, y_true, pred_v1, pred_v2, features=None, n_bins=3,
+                   min_size=MIN_GROUP_SIZE):
+    """
+    Scans quantile subgroups of many features (all columns by default)
+    using predictions from the shared inference pass.
+
+    Returns one row per (feature, bin) with at least min_size rows,
+    ranked by accuracy drop of the candidate vs the baseline
+    (`drop`), with the candidate's gap to its overall accuracy
+    (`bias_drop`). Features with non-unique quantile edges
+    (too many tied values) are left out.
+    """
+    features = list(X.columns if features is None else features)
+    y_true = np.asarray(y_true)
+    correct_v1 = pred_v1 == y_true
+    correct_v2 = pred_v2 == y_true
+
+    codes, edges, unique = quantile_bins(X, features, n_bins)
+    acc1, sizes = grouped_accuracy(correct_v1, codes, n_bins)
+    acc2, _ = grouped_accuracy(correct_v2, codes, n_bins)
+
+    f_idx, b_idx = np.nonzero((sizes >= min_size) & unique[:, None])
+    table = pd.DataFrame({
+        "feature": np.asarray(features, dtype=object)[f_idx],
+        "bin": b_idx,
+        "low": edges[f_idx, b_idx],
+        "high": edges[f_idx, b_idx + 1],
+        "size": sizes[f_idx, b_idx],
+        "acc_v1": acc1[f_idx, b_idx],
+        "acc_v2": acc2[f_idx, b_idx],
+    })
+    table["drop"] = table["acc_v1"] - table["acc_v2"]
+    table["bias_drop"] = np.mean(correct_v2) - table["acc_v2"]
+
+    return table.sort_values(
+        ["drop", "bias_drop"], ascending=False, kind="stable"
+    ).reset_index(drop=True)
@@ -0,0 +1,224 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from analysis.drift import DEFAULT_CHUNK_ROWS, parallel_shap_abs_sums
+from analysis.inference import ensure_frame
+from analysis.instrumentation import checkpoint, stage
+
+
+# ===============================
+# Fingerprints
+# ===============================
+def model_fingerprint(model):
+    """
+    Content hash of a fitted model (independent of where it was loaded from).
+
+    Tree ensembles are hashed field by field: the pickled node array
+    contains struct padding bytes that differ between loads, so
+    hashing the whole object is not stable for sklearn trees.
+    """
+    estimators = getattr(model, "estimators_", None)
+    if estimators is None:
+        estimators = [model]
+    # Gradient boosting keeps a 2-D array of trees
+    trees = [t for est in estimators for t in getattr(est, "ravel", lambda: [est])()]
+    if not all(hasattr(t, "tree_") for t in trees):
+        return joblib.hash(model)
+
+    h = hashlib.sha256(type(model).__name__.encode())
+    h.update(repr(sorted(model.get_params(deep=False).items())).encode())
+    h.update(np.asarray(getattr(model, "classes_", [])).tobytes())
+    h.update(repr(list(getattr(model, "feature_names_in_", []))).encode())
+
+    for est in trees:
+        tree = est.tree_
+        for arr in (tree.children_left, tree.children_right,
+                    tree.feature, tree.threshold, tree.value):
+            h.update(np.ascontiguousarray(arr).tobytes())
+        # NaN routing (sklearn >= 1.3); two forests may differ only here
+        missing = getattr(tree, "missing_go_to_left", None)
+        if missing is not None:
+            h.update(np.ascontiguousarray(missing).tobytes())
+
+    # Boosting starts from the fitted prior of its init estimator
+    init = getattr(model, "init_", None)
+    for name in ("class_prior_", "constant_"):
+        if hasattr(init, name):
+            h.update(np.ascontiguousarray(getattr(init, name)).tobytes())
+
+    return h.hexdigest()[:32]
+
+
+def dataset_fingerprint(X):
+    """
+    Content hash of an evaluation frame: column names, dtypes and values.
+    """
+    h = hashlib.sha256()
+    h.update(repr([(str(c), str(t)) for c, t in X.dtypes.items()]).encode())
+    h.update(pd.util.hash_pandas_object(X, index=True).to_numpy().tobytes())
+    return h.hexdigest()[:32]
+
+
+# ===============================
+# On-disk Summary Cache
+# ===============================
+class SummaryCache:
+    """
+    Persistent per-model inference summaries, keyed by
+    (model content hash, dataset fingerprint).
+
+    Layout: <directory>/<dataset fingerprint>/<model hash>.npz
+    Each entry holds the per-row probabilities and, once computed,
+    the per-feature |SHAP| sums. Entries are touched on every hit
+    and evicted least-recently-used once the total size exceeds
+    max_bytes.
+    """
+
+    def __init__(self, directory=".cache/model_summaries",
+                 max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _path(self, model_hash, data_hash):
+        return os.path.join(self.directory, data_hash, f"{model_hash}.npz")
+
+    def get(self, model_hash, data_hash):
+        path = self._path(model_hash, data_hash)
+        try:
+            with np.load(path) as f:
+                summary = {name: f[name] for name in f.files}
+            os.utime(path)
+        except (FileNotFoundError, OSError, ValueError, zipfile.BadZipFile):
+            # Missing, or truncated by a crash mid-write: recompute
+            return None
+        return summary
+
+    def put(self, model_hash, data_hash, summary):
+        path = self._path(model_hash, data_hash)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write-then-rename so readers never see a partial file
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **summary)
+        os.replace(tmp, path)
+
+        self.evict()
+
+    def entries(self):
+        """
+        (path, size, last access) for every cached summary.
+        """
+        found = []
+        if not os.path.isdir(self.directory):
+            return found
+        for data_hash in os.listdir(self.directory):
+            folder = os.path.join(self.directory, data_hash)
+            if not os.path.isdir(folder):
+                continue
+            for name in os.listdir(folder):
+                if name.endswith(".npz"):
+                    try:
+                        st = os.stat(os.path.join(folder, name))
+                    except FileNotFoundError:
+                        continue
+                    found.append((os.path.join(folder, name), st.st_size, st.st_mtime))
+        return found
+
+    def evict(self):
+        with self._lock:
+            entries = sorted(self.entries(), key=lambda e: e[2])
+            total = sum(size for _, size, _ in entries)
+            for path, size, _ in entries:
+                if total <= self.max_bytes:
+                    break
+                # Tournament workers share the directory and may
+                # evict the same file
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+    def invalidate(self, keep_data_hash=None):
+        """
+        Drops cached summaries computed on any dataset other than
+        keep_data_hash (all of them when it is None).
+        """
+        if not os.path.isdir(self.directory):
+            return
+        for data_hash in os.listdir(self.directory):
+            if data_hash != keep_data_hash:
+                shutil.rmtree(os.path.join(self.directory, data_hash),
+                              ignore_errors=True)
+
+
+# ===============================
+# Per-model Summary
+# ===============================
+def model_summaries(models, X, cache=None, with_shap=True, n_jobs=1,
+                    chunk_size=DEFAULT_CHUNK_ROWS, profiler=None):
+    """
+    Per-row probabilities and (optionally) per-feature |SHAP| sums
+    for several models on one dataset, served from `cache` when possible.
+
+    Only the missing pieces are computed; SHAP for all models that
+    still need it runs as one batch on the chunked SHAP engine.
+    Returns one dict per model with "proba" and, when with_shap,
+    "shap_abs_sum".
+    """
+    X = ensure_frame(X, models[0])
+
+    keys = [None] * len(models)
+    summaries = [{} for _ in models]
+    if cache is not None:
+        with stage(profiler, "summary_cache_read", rows=len(X)):
+            data_hash = dataset_fingerprint(X)
+            for i, model in enumerate(models):
+                keys[i] = (model_fingerprint(model), data_hash)
+                summaries[i] = cache.get(*keys[i]) or {}
+
+    dirty = set()
+    need_proba = [i for i in range(len(models)) if "proba" not in summaries[i]]
+    if need_proba:
+        with stage(profiler, "predict_proba", rows=len(X) * len(need_proba)):
+            for i in need_proba:
+                summaries[i]["proba"] = models[i].predict_proba(X)
+                dirty.add(i)
+
+    need_shap = [i for i in range(len(models))
+                 if with_shap and "shap_abs_sum" not in summaries[i]]
+    if need_shap:
+        with stage(profiler, "shap_values", rows=len(X) * len(need_shap)):
+            sums = parallel_shap_abs_sums(
+                [models[i] for i in need_shap], X,
+                n_jobs=n_jobs, chunk_size=chunk_size,
+                checkpoint=checkpoint(profiler)
+            )
+        for i, s in zip(need_shap, sums):
+            summaries[i]["shap_abs_sum"] = s
+            dirty.add(i)
+
+    if cache is not None and dirty:
+        with stage(profiler, "summary_cache_write"):
+            for i in sorted(dirty):
+                cache.put(*keys[i], summaries[i])
+
+    return summaries
+
+
+def model_summary(model, X, cache=None, with_shap=True, n_jobs=1,
+                  chunk_size=DEFAULT_CHUNK_ROWS):
+    return model_summaries(
+        [model], X, cache=cache, with_shap=with_shap,
+        n_jobs=n_jobs, chunk_size=chunk_size
+    )[0]
@@ -0,0 +1,149 @@
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import pandas as pd
+
+from analysis.dataset_store import load_features, load_labels
+from analysis.drift import DEFAULT_DRIFT_TOL
+from analysis.inference import ensure_frame
+from analysis.risk_pipeline import RISK_WEIGHTS, evaluate_from_summaries
+from analysis.schema import validate_evaluation_data
+from analysis.summary_cache import SummaryCache, model_summaries
+
+
+COLUMNS = ["candidate", *RISK_WEIGHTS, "final_risk_score", "decision"]
+
+
+# ===============================
+# Candidate Evaluation
+# ===============================
+# Per-process state set once by the pool initializer: the baseline,
+# its summary and the evaluation data are never re-sent per candidate.
+_SHARED = {}
+
+
+def _init_worker(shared):
+    _SHARED.update(shared)
+
+
+def _evaluate_candidate(name, candidate):
+    s = _SHARED
+    model = joblib.load(candidate) if isinstance(candidate, str) else candidate
+    cache = SummaryCache(s["cache_dir"]) if s["cache_dir"] else None
+    validate_evaluation_data(s["X_test"], s["y_test"], [model])
+
+    cand, = model_summaries(
+        [model], s["X_test"], cache=cache,
+        with_shap=s["drift_mode"] == "exact"
+    )
+    report = evaluate_from_summaries(
+        s["baseline"], model, s["base"], cand,
+        s["X_test"], s["y_test"],
+        feature=s["feature"],
+        drift_mode=s["drift_mode"],
+        drift_tol=s["drift_tol"]
+    )
+    return {"candidate": name, **report}
+
+
+def run_tournament(baseline_model, candidates, X_test, y_test,
+                   feature="mean radius", drift_mode="exact",
+                   drift_tol=DEFAULT_DRIFT_TOL, n_jobs=None, cache_dir=None):
+    """
+    Evaluates many candidates against one baseline in a single run.
+
+    `candidates` maps a name to a fitted model or a .pkl path (paths
+    are loaded inside the workers). Baseline inference and SHAP run
+    once; candidates are evaluated concurrently on a process pool.
+
+    Returns a DataFrame ranked from lowest to highest final risk.
+    """
+    X_test = ensure_frame(X_test, baseline_model)
+    validate_evaluation_data(X_test, y_test, [baseline_model], features=[feature])
+    cache = SummaryCache(cache_dir) if cache_dir else None
+
+    base, = model_summaries(
+        [baseline_model], X_test, cache=cache,
+        with_shap=drift_mode == "exact", n_jobs=n_jobs
+    )
+
+    shared = {
+        "baseline": baseline_model,
+        "base": base,
+        "X_test": X_test,
+        "y_test": y_test,
+        "feature": feature,
+        "drift_mode": drift_mode,
+        "drift_tol": drift_tol,
+        "cache_dir": cache_dir,
+    }
+
+    n_jobs = min(n_jobs or os.cpu_count() or 1, max(len(candidates), 1))
+    if n_jobs == 1:
+        _init_worker(shared)
+        rows = [_evaluate_candidate(name, c) for name, c in candidates.items()]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=n_jobs,
+            initializer=_init_worker,
+            initargs=(shared,),
+        ) as pool:
+            futures = [pool.submit(_evaluate_candidate, name, c)
+                       for name, c in candidates.items()]
+            rows = [f.result() for f in futures]
+
+    table = pd.DataFrame(rows)
+    table = table.sort_values("final_risk_score", kind="stable").reset_index(drop=True)
+    table.insert(0, "rank", range(1, len(table) + 1))
+    return table
+
+
+# ===============================
+# CLI
+# ===============================
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Rank candidate models against one baseline."
+    )
+    parser.add_argument("baseline", help="baseline model .pkl")
+    parser.add_argument("candidates", nargs="+", help="candidate model .pkl files")
+    parser.add_argument("--X-test", default="data/test")
+    parser.add_argument("--y-test", default="data/test")
+    parser.add_argument("--feature", default="mean radius")
+    parser.add_argument("--drift-mode", choices=["exact", "approximate"], default="exact")
+    parser.add_argument("--drift-tol", type=float, default=DEFAULT_DRIFT_TOL)
+    parser.add_argument("--jobs", type=int, default=None)
+    parser.add_argument("--cache-dir", default=None,
+                        help="persistent per-model summary cache directory")
+    parser.add_argument("--output", help="write the ranked table (.csv or .json)")
+    args = parser.parse_args(argv)
+
+    table = run_tournament(
+        joblib.load(args.baseline),
+        {os.path.basename(p): p for p in args.candidates},
+        load_features(args.X_test),
+        load_labels(args.y_test),
+        feature=args.feature,
+        drift_mode=args.drift_mode,
+        drift_tol=args.drift_tol,
+        n_jobs=args.jobs,
+        cache_dir=args.cache_dir
+    )
+
+    if args.output:
+        if args.output.endswith(".json"):
+            table.to_json(args.output, orient="records", indent=2, double_precision=15)
+        else:
+            table.to_csv(args.output, index=False)
+
+    print("\n====== MODEL TOURNAMENT ======")
+    print(f"Baseline: {args.baseline}\n")
+    print(table[["rank", *COLUMNS]].to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""
+Managed storage and background loading for uploaded models.
+
+Uploads are streamed in chunks into one temp directory per process,
+named by content hash, and removed when replaced, on cleanup() or at
+interpreter exit. Directories left behind by processes that died
+without cleaning up are swept on start. Each model is unpickled on
+a background thread as soon as it is stored, so its compatibility
+with the evaluation data can be shown before the run starts.
+"""
+import atexit
+import glob
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from analysis.model_cache import load_model
+
+UPLOAD_PREFIX = "modelguard-uploads-"
+UPLOAD_CHUNK_BYTES = 1 << 20
+
+# Unpickling is mostly I/O and allocation; two loaders cover the
+# baseline and candidate uploads of a session.
+_LOADER = ThreadPoolExecutor(max_workers=2, thread_name_prefix="model-loader")
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def sweep_orphans(root=None):
+    """
+    Removes upload directories of processes that no longer exist.
+    """
+    for path in glob.glob(os.path.join(root or tempfile.gettempdir(), UPLOAD_PREFIX + "*")):
+        try:
+            pid = int(os.path.basename(path)[len(UPLOAD_PREFIX):].split("-")[0])
+        except ValueError:
+            continue
+        if pid != os.getpid() and not _pid_alive(pid):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+class UploadStore:
+    """
+    Content-addressed temp storage for uploaded files.
+    """
+
+    def __init__(self, root=None):
+        sweep_orphans(root)
+        self.directory = tempfile.mkdtemp(prefix=f"{UPLOAD_PREFIX}{os.getpid()}-", dir=root)
+        self._refs = {}
+        self._lock = threading.Lock()
+        atexit.register(self.cleanup)
+
+    def save(self, fileobj, suffix=".pkl", chunk_size=UPLOAD_CHUNK_BYTES):
+        """
+        Streams a file-like object to disk in chunks, hashing as it
+        goes. Returns the stored path (identical uploads share it).
+        """
+        if hasattr(fileobj, "seek"):
+            fileobj.seek(0)
+
+        h = hashlib.sha256()
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for block in iter(lambda: fileobj.read(chunk_size), b""):
+                    h.update(block)
+                    out.write(block)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+        path = os.path.join(self.directory, h.hexdigest() + suffix)
+        with self._lock:
+            os.replace(tmp, path)
+            self._refs[path] = self._refs.get(path, 0) + 1
+        return path
+
+    def discard(self, path):
+        """
+        Drops one reference to a stored file; deletes it with the last.
+        """
+        with self._lock:
+            refs = self._refs.get(path, 0) - 1
+            if refs > 0:
+                self._refs[path] = refs
+                return
+            self._refs.pop(path, None)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def cleanup(self):
+        with self._lock:
+            self._refs.clear()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def load_model_async(path):
+    """
+    Future resolving to the unpickled model, served from the
+    process-wide model cache when another session already loaded it.
+    """
+    return _LOADER.submit(load_model, path)
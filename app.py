@@ -2,16 +2,28 @@
 # IMPORTS
 # ==============================
 import streamlit as st
-import joblib
-import tempfile
 import base64
+import json
 import os
-import matplotlib.pyplot as plt
 import numpy as np
 
-from analysis.compute_metrics import compute_metrics
-from analysis.subgroup_risk import compute_subgroup_risk
-from analysis.bias_severity import compute_bias_severity
+from analysis.dataset_store import load_features, load_labels, read_schema
+from analysis.flip_explorer import flip_explorer
+from analysis.hashing import file_digest
+from analysis.jobs import RISK_JOBS, leave_session_job, retry_session_job, session_job
+from analysis.model_cache import MODEL_CACHE, load_model
+from analysis.report_artifacts import render_in_background
+from analysis.result_cache import (
+    APP_REPORT_OPTIONS,
+    SUMMARY_CACHE_DIR,
+    cached_risk_report,
+    risk_cache_key,
+)
+from analysis.risk_pipeline import deployment_decision
+from analysis.schema import model_compatibility
+from analysis.uploads import UploadStore, load_model_async
+
+EVAL_DATA = APP_REPORT_OPTIONS["X_path"]
 
 
 # ==============================
@@ -82,6 +94,261 @@ if bg_image:
     """, unsafe_allow_html=True)
 
 
+# ==============================
+# UPLOADS
+# ==============================
+@st.cache_resource
+def upload_store():
+    # One managed temp directory per server process, removed at exit
+    return UploadStore()
+
+
+@st.cache_resource
+def evaluation_schema():
+    return read_schema(EVAL_DATA)["features"], np.unique(load_labels(EVAL_DATA))
+
+
+def track_upload(slot, uploaded):
+    """
+    Streams a newly uploaded file to managed storage and starts
+    unpickling it in the background. A replaced or removed upload
+    is deleted.
+    """
+    current = st.session_state.get(slot)
+    file_id = uploaded.file_id if uploaded is not None else None
+
+    if current is not None and current["file_id"] == file_id:
+        return current
+    if current is not None:
+        upload_store().discard(current["path"])
+        del st.session_state[slot]
+    if uploaded is None:
+        return None
+
+    path = upload_store().save(uploaded)
+    current = {"file_id": file_id, "path": path, "future": load_model_async(path)}
+    st.session_state[slot] = current
+    return current
+
+
+def upload_problems(upload):
+    """
+    None while the model is still loading, else the list of reasons
+    it cannot be evaluated (empty when compatible).
+    """
+    if not upload["future"].done():
+        return None
+    try:
+        model = upload["future"].result()
+    except Exception as e:
+        return [f"Could not load the model: {e}"]
+    return model_compatibility(model, *evaluation_schema())
+
+
+def show_upload_status(label, upload):
+    if upload is None:
+        return
+    problems = upload_problems(upload)
+    if problems is None:
+        st.caption(f"⏳ {label}: loading in the background...")
+    elif problems:
+        st.error(f"❌ {label}: " + "; ".join(problems))
+    else:
+        model = upload["future"].result()
+        st.caption(
+            f"✅ {label}: {type(model).__name__}, "
+            f"{getattr(model, 'n_features_in_', '?')} features - compatible"
+        )
+
+
+def loaded_models():
+    """
+    The (baseline, candidate) pair unpickled on the upload page,
+    if it belongs to the paths being evaluated.
+    """
+    base = st.session_state.get("baseline_upload")
+    cand = st.session_state.get("updated_upload")
+    if (base is None or cand is None
+            or base["path"] != st.session_state.get("baseline_path")
+            or cand["path"] != st.session_state.get("updated_path")):
+        return None
+    return base["future"].result(), cand["future"].result()
+
+
+# ==============================
+# BACKGROUND ANALYSIS
+# ==============================
+def risk_job():
+    """
+    The queued analysis of the models under review. Submitted once per
+    (model contents, options); reruns and other sessions reviewing the
+    same pair poll the same job. None after this session cancelled it.
+    """
+    baseline_path = st.session_state.baseline_path
+    updated_path = st.session_state.updated_path
+    drift_mode = st.session_state.get("drift_mode", "exact")
+    key = risk_cache_key(baseline_path, updated_path,
+                         drift_mode=drift_mode, **APP_REPORT_OPTIONS)
+
+    models = loaded_models()
+    return session_job(
+        st.session_state,
+        RISK_JOBS,
+        key,
+        lambda profiler: cached_risk_report(
+            baseline_path,
+            updated_path,
+            drift_mode=drift_mode,
+            profiler=profiler,
+            models=models,
+            **APP_REPORT_OPTIONS
+        )
+    )
+
+
+def show_job_progress(job):
+    # Polls the job every second and reruns the page once it finishes
+    @st.fragment(run_every=1)
+    def poll():
+        if job.done:
+            st.rerun()
+
+        progress = job.progress()
+        if progress["status"] == "queued":
+            stats = RISK_JOBS.stats()
+            st.info(
+                f"⏳ Queued for analysis (position {RISK_JOBS.position(job)}; "
+                f"{stats['running']} running on {stats['workers']} workers)"
+            )
+        else:
+            st.info(f"🔄 Running AI Risk Diagnostics: {progress['stage'] or 'starting'}")
+            st.caption(
+                f"{progress['stages_done']} stages done, "
+                f"{progress['rows_processed']:,} rows processed, "
+                f"{progress['elapsed_s']:.0f}s elapsed"
+            )
+
+        # Leaves the job; it stops once no other session waits for it
+        if st.button("✖ Cancel Analysis"):
+            leave_session_job(st.session_state, RISK_JOBS, cancelled=True)
+            st.rerun()
+
+    poll()
+
+
+def show_job_failure(job):
+    if job is None or job.status == "cancelled":
+        st.warning("✖ Analysis cancelled.")
+    else:
+        st.error("❌ Error loading models or computing risk.")
+        st.error(str(job.error))
+
+    col1, col2 = st.columns(2)
+    if col1.button("🔁 Retry Analysis"):
+        retry_session_job(st.session_state, RISK_JOBS)
+        st.rerun()
+    if col2.button("⬅ Back to Model Upload", key="back_after_failure"):
+        st.session_state.page = "upload"
+        st.rerun()
+
+
+def report_artifacts(job):
+    """
+    Future of the rendered chart / HTML report of a finished job.
+    Rendered once per job key in the background, then served from disk.
+    """
+    return render_in_background(
+        job.key,
+        job.result,
+        st.session_state.baseline_path,
+        st.session_state.updated_path,
+        APP_REPORT_OPTIONS["X_path"],
+        APP_REPORT_OPTIONS["y_path"],
+        feature=APP_REPORT_OPTIONS["feature"],
+        summary_cache_dir=SUMMARY_CACHE_DIR
+    )
+
+
+def show_report_artifacts(artifacts, show_chart):
+    pending = not artifacts.done()
+
+    # Polls while the report is rendered in the background, then
+    # reruns the page once so the timer stops
+    @st.fragment(run_every=1 if pending else None)
+    def rendered():
+        if not artifacts.done():
+            st.caption("🖼 Rendering risk report...")
+            return
+        if pending:
+            st.rerun()
+        if artifacts.exception() is not None:
+            st.warning(f"Could not render the risk report: {artifacts.exception()}")
+            return
+
+        paths = artifacts.result()
+        try:
+            with open(paths["html"], "rb") as f:
+                html_bytes = f.read()
+            with open(paths["png"], "rb") as f:
+                png_bytes = f.read()
+        except FileNotFoundError:
+            # Evicted from the artifact store since; the rerun renders it again
+            st.rerun()
+
+        if show_chart:
+            st.image(png_bytes)
+
+        col1, col2 = st.columns(2)
+        col1.download_button("⬇ Download Report (HTML)", data=html_bytes,
+                             file_name="risk_report.html", mime="text/html")
+        col2.download_button("⬇ Download Chart (PNG)", data=png_bytes,
+                             file_name="risk_chart.png", mime="image/png")
+
+    rendered()
+
+
+def job_explorer(job):
+    """
+    FlipExplorer of the job's model pair, built once per job. Its
+    probabilities come from the summary cache the analysis filled.
+    """
+    cached = st.session_state.get("flip_explorer")
+    if cached is not None and cached[0] == job.key:
+        return cached[1]
+
+    from analysis.summary_cache import SummaryCache
+
+    models = loaded_models() or (load_model(st.session_state.baseline_path),
+                                 load_model(st.session_state.updated_path))
+    explorer = flip_explorer(
+        *models,
+        load_features(EVAL_DATA),
+        load_labels(EVAL_DATA),
+        cache=SummaryCache(SUMMARY_CACHE_DIR),
+        data_key=file_digest(EVAL_DATA)
+    )
+    st.session_state.flip_explorer = (job.key, explorer)
+    return explorer
+
+
+def show_flip_explorer(job):
+    explorer = job_explorer(job)
+    if not len(explorer.flipped):
+        st.caption("No predictions flipped between the two models.")
+        return
+
+    st.caption(
+        f"{len(explorer.flipped):,} flipped rows, largest probability change first"
+    )
+    flips = explorer.top_flips()
+    st.dataframe(flips, hide_index=True)
+
+    col1, col2 = st.columns([3, 1])
+    row = col1.selectbox("Row", flips["row"])
+    k = col2.number_input("Neighbours", min_value=1, max_value=100, value=10)
+    st.dataframe(explorer.neighbors(row, k=int(k)), hide_index=True)
+
+
 # ==============================
 # SESSION STATE
 # ==============================
@@ -104,22 +371,42 @@ if st.session_state.page == "upload":
     old_model = st.file_uploader("📂 Upload Baseline Model (.pkl)", type=["pkl"])
     new_model = st.file_uploader("📂 Upload Candidate Model (.pkl)", type=["pkl"])
 
-    if st.button("⚡ Run Deployment Risk Analysis"):
+    uploads = {
+        "Baseline": track_upload("baseline_upload", old_model),
+        "Candidate": track_upload("updated_upload", new_model),
+    }
+    loading = any(u is not None and not u["future"].done() for u in uploads.values())
 
-        if old_model and new_model:
+    # Re-renders by itself while a model is still being unpickled
+    @st.fragment(run_every=1 if loading else None)
+    def upload_status():
+        for label, upload in uploads.items():
+            show_upload_status(label, upload)
 
-            temp_old = tempfile.NamedTemporaryFile(delete=False)
-            temp_old.write(old_model.read())
-            temp_old.close()
+    upload_status()
 
-            temp_new = tempfile.NamedTemporaryFile(delete=False)
-            temp_new.write(new_model.read())
-            temp_new.close()
+    fast_drift = st.checkbox(
+        "⏱ Fast approximate feature drift (sampled SHAP)",
+        value=st.session_state.get("drift_mode") == "approximate"
+    )
 
-            st.session_state.baseline_path = temp_old.name
-            st.session_state.updated_path = temp_new.name
-            st.session_state.page = "results"
-            st.rerun()
+    if st.button("⚡ Run Deployment Risk Analysis"):
+
+        if all(uploads.values()):
+
+            with st.spinner("🔄 Loading models..."):
+                for upload in uploads.values():
+                    upload["future"].exception()
+
+            problems = {label: upload_problems(u) for label, u in uploads.items()}
+            if any(problems.values()):
+                st.error("❌ Fix the incompatible model(s) above before running.")
+            else:
+                st.session_state.baseline_path = uploads["Baseline"]["path"]
+                st.session_state.updated_path = uploads["Candidate"]["path"]
+                st.session_state.drift_mode = "approximate" if fast_drift else "exact"
+                st.session_state.page = "results"
+                st.rerun()
 
         else:
             st.warning("Please upload both models.")
@@ -133,43 +420,29 @@ elif st.session_state.page == "results":
     st.title("📊 AI Risk Intelligence Report")
 
     try:
-        with st.spinner("🔄 Running AI Risk Diagnostics..."):
-
-            baseline_model = joblib.load(st.session_state.baseline_path)
-            updated_model = joblib.load(st.session_state.updated_path)
-
-            X_test = joblib.load("data/X_test.pkl")
-            y_test = joblib.load("data/y_test.pkl")
-
-            flip_rate, conf_shift, feature_drift = compute_metrics(
-                baseline_model,
-                updated_model,
-                X_test
-            )
-
-            subgroup_risk = compute_subgroup_risk(
-                baseline_model,
-                updated_model,
-                X_test,
-                y_test,
-                feature="mean radius"
-            )
-
-            bias_severity = compute_bias_severity(
-                updated_model,
-                X_test,
-                y_test,
-                feature="mean radius"
-            )
-
-            # FINAL RISK SCORE (0–1)
-            final_risk_score = (
-                0.30 * flip_rate +
-                0.25 * conf_shift +
-                0.20 * feature_drift +
-                0.15 * subgroup_risk +
-                0.10 * bias_severity
-            )
+        # Runs on the shared job queue; this script thread only polls.
+        # Results are cached by content hash of both models and the
+        # test data, so reruns (graph toggle, back button) are instant.
+        job = risk_job()
+        if job is not None and not job.done:
+            show_job_progress(job)
+            st.stop()
+        if job is None or job.status != "done":
+            show_job_failure(job)
+            st.stop()
+
+        report = job.result
+        profiler = job.profiler
+        artifacts = report_artifacts(job)
+
+        flip_rate = report["flip_rate"]
+        conf_shift = report["conf_shift"]
+        feature_drift = report["feature_drift"]
+        subgroup_risk = report["subgroup_risk"]
+        bias_severity = report["bias_severity"]
+
+        # FINAL RISK SCORE (0–1)
+        final_risk_score = report["final_risk_score"]
 
         st.markdown("---")
         st.subheader("🧠 Risk Components")
@@ -178,29 +451,68 @@ elif st.session_state.page == "results":
 
         col1.metric("Prediction Flip Rate", round(flip_rate, 4))
         col1.metric("Confidence Shift", round(conf_shift, 4))
-        col1.metric("Feature Drift", round(feature_drift, 4))
+        col1.metric("Feature Drift", "skipped" if feature_drift is None else round(feature_drift, 4))
+
+        if report["drift_mode"] == "approximate":
+            low, high = report["drift_ci"]
+            col1.caption(
+                f"Approximate: 95% CI [{low:.4f}, {high:.4f}] "
+                f"from {report['drift_rows_used']} rows"
+            )
 
         col2.metric("Subgroup Risk", round(subgroup_risk, 4))
         col2.metric("Bias Severity Score", round(bias_severity, 4))
 
+        with st.expander("⏱ Stage Timings"):
+            st.dataframe(report["timings"])
+            cache = MODEL_CACHE.stats()
+            st.caption(
+                f"Model cache: {cache['entries']} models, "
+                f"{cache['resident_mb']:.1f} / {cache['budget_mb']:.0f} MB, "
+                f"{cache['hits']} hits, {cache['misses']} misses, "
+                f"{cache['evictions']} evictions"
+            )
+            st.download_button(
+                "⬇ Download Trace (Chrome / Perfetto)",
+                data=json.dumps(profiler.chrome_trace()),
+                file_name="risk_trace.json",
+                mime="application/json"
+            )
+
         st.markdown("---")
         st.subheader("🎯 Final Risk Score (0 – 1 Scale)")
         st.metric("Overall Risk Score", round(final_risk_score, 4))
         st.progress(min(final_risk_score, 1.0))
 
+        interval = report["intervals"]["final_risk_score"]
+        st.caption(
+            f"95% bootstrap interval: [{interval['low']:.4f}, {interval['high']:.4f}]"
+        )
+
         st.markdown("---")
         st.subheader("🚦 Deployment Recommendation")
 
-        # Realistic thresholds
-        if final_risk_score < 0.02:
+        # Realistic thresholds (see analysis/risk_pipeline.py)
+        deployment_status = report["decision"]
+        upper_status = deployment_decision(interval["high"])
+
+        if deployment_status == "DEPLOY":
             st.success("✅ SAFE TO DEPLOY (Automatic Deployment Triggered)")
-            deployment_status = "DEPLOY"
-        elif final_risk_score < 0.07:
+        elif deployment_status == "REVIEW":
             st.warning("⚠ MEDIUM RISK – Manual Approval Required")
-            deployment_status = "REVIEW"
         else:
             st.error("❌ HIGH RISK – Automatic ROLLBACK Triggered")
-            deployment_status = "ROLLBACK"
+
+        if upper_status != deployment_status:
+            st.info(
+                f"ℹ At the upper end of its 95% interval this update "
+                f"would be classed as {upper_status}."
+            )
+
+        st.markdown("---")
+
+        with st.expander("🔍 Flip Explorer"):
+            show_flip_explorer(job)
 
         st.markdown("---")
 
@@ -210,46 +522,8 @@ elif st.session_state.page == "results":
         if st.button("📊  Risk Graph"):
             st.session_state.show_graph = not st.session_state.show_graph
 
-        if st.session_state.show_graph:
-
-            components = [
-                flip_rate,
-                conf_shift,
-                feature_drift,
-                subgroup_risk,
-                bias_severity
-            ]
-
-            labels = [
-                "Flip",
-                "Confidence",
-                "Drift",
-                "Subgroup",
-                "Bias"
-            ]
-
-            fig, ax = plt.subplots(figsize=(8, 5))
-
-            bars = ax.bar(labels, components)
-
-            ax.set_ylim(0, max(components) + 0.02)
-            ax.set_title("Risk Component Distribution", fontsize=14)
-            ax.set_ylabel("Risk Score")
-
-            # Add value labels
-            for bar in bars:
-                height = bar.get_height()
-                ax.text(
-                    bar.get_x() + bar.get_width()/2,
-                    height,
-                    f"{height:.3f}",
-                    ha='center',
-                    va='bottom'
-                )
-
-            ax.grid(axis='y', linestyle='--', alpha=0.4)
-
-            st.pyplot(fig)
+        # Pre-rendered once per analysis (analysis/report_artifacts.py)
+        show_report_artifacts(artifacts, st.session_state.show_graph)
 
         st.markdown("---")
 
@@ -0,0 +1,310 @@
+"""
+Benchmark suite for the risk engine.
+
+Times and memory-profiles every stage of a risk run (model load,
+predict_proba, flip/confidence, subgroup, bias, SHAP drift, final
+scoring) over the shipped model pairs and synthetic forests, on
+up-scaled copies of data/test.
+
+    python -m benchmarks.bench_risk_engine --sizes 1000 10000 100000 \\
+        --output bench.json
+    python -m benchmarks.bench_risk_engine --compare bench.json --output new.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from analysis.bias_severity import compute_bias_severity
+from analysis.compute_metrics import confidence_shift, prediction_flip_rate
+from analysis.dataset_store import load_features, load_labels
+from analysis.drift import exact_shap_drift
+from analysis.inference import run_inference
+from analysis.risk_pipeline import deployment_decision, final_risk_score
+from analysis.subgroup_risk import compute_subgroup_risk
+
+SHIPPED_PAIRS = [
+    ("models/model_v0.pkl", "models/model_v1.pkl"),
+    ("models/model_v0.pkl", "models/model_v2.pkl"),
+    ("models/model_v0.pkl", "models/model_v3.pkl"),
+]
+SYNTHETIC_FORESTS = [(50, 4), (120, 8), (300, None)]
+
+# Regression gate: best of DEFAULT_REPEAT round-robin runs, flagged
+# only when both the ratio and the absolute slowdown are exceeded.
+# Self-compares on a shared single-CPU host still differ by up to
+# ~1.45x on multi-second stages and ~15 ms on fast ones.
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 1.5
+DEFAULT_MIN_DELTA_S = 0.02
+
+
+# ===============================
+# Data
+# ===============================
+def upscale(X, y, n_rows, seed=0):
+    """
+    Resamples X_test to n_rows with 1% multiplicative jitter so
+    trees see new (but realistic) values.
+    """
+    rng = np.random.default_rng(seed)
+    idx = rng.integers(0, len(X), n_rows)
+    values = X.to_numpy()[idx] * rng.normal(1.0, 0.01, (n_rows, X.shape[1]))
+    return (
+        pd.DataFrame(values, columns=X.columns),
+        pd.Series(y.to_numpy()[idx], name=y.name),
+    )
+
+
+def synthetic_forest(n_estimators, max_depth, seed=0):
+    from sklearn.ensemble import RandomForestClassifier
+
+    X_train = load_features("data/train")
+    y_train = load_labels("data/train")
+    model = RandomForestClassifier(
+        n_estimators=n_estimators, max_depth=max_depth, random_state=seed
+    )
+    return model.fit(X_train, y_train)
+
+
+# ===============================
+# Measurement
+# ===============================
+def pair_stages(record, load, X, y, with_shap):
+    """
+    One pass over every stage of a (baseline, candidate) pair;
+    record(stage, fn) runs each stage and returns its result.
+    """
+    baseline, candidate = record("model_load", load)
+    inference = record(
+        "predict_proba", lambda: run_inference(baseline, candidate, X)
+    )
+    flip, conf = record(
+        "flip_confidence",
+        lambda: (prediction_flip_rate(inference), confidence_shift(inference)),
+    )
+    subgroup = record(
+        "subgroup",
+        lambda: compute_subgroup_risk(
+            baseline, candidate, X, y, "mean radius", inference=inference
+        ),
+    )
+    bias = record(
+        "bias",
+        lambda: compute_bias_severity(
+            candidate, X, y, "mean radius", proba=inference["proba_v2"]
+        ),
+    )
+    drift = record(
+        "shap_drift", lambda: exact_shap_drift(baseline, candidate, X)
+    ) if with_shap else 0.0
+
+    components = {
+        "flip_rate": flip, "conf_shift": conf, "feature_drift": drift,
+        "subgroup_risk": subgroup, "bias_severity": bias,
+    }
+    record(
+        "final_scoring",
+        lambda: deployment_decision(final_risk_score(components)),
+    )
+
+
+def bench_pair(case, load, X, y, repeat, with_shap, memory=True):
+    """
+    Best wall/CPU time of every stage for one pair; returns rows.
+
+    The stages run round-robin, `repeat` passes over the whole pair,
+    so each stage's runs are spread over the case instead of back to
+    back: a burst of host slowdown then costs a stage one sample, not
+    all of them. Peak traced memory (numpy buffers included) comes
+    from one extra pass, since tracemalloc itself slows
+    allocation-heavy stages down.
+    """
+    stats = {}
+
+    def timed(stage, fn):
+        wall, cpu = time.perf_counter(), time.process_time()
+        result = fn()
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        best = stats.setdefault(stage, {"wall_s": float("inf"),
+                                        "cpu_s": float("inf"), "peak_mb": None})
+        best["wall_s"], best["cpu_s"] = min(best["wall_s"], wall), min(best["cpu_s"], cpu)
+        return result
+
+    def traced(stage, fn):
+        tracemalloc.start()
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        stats[stage]["peak_mb"] = peak / 2**20
+        return result
+
+    for _ in range(repeat):
+        pair_stages(timed, load, X, y, with_shap)
+    if memory:
+        pair_stages(traced, load, X, y, with_shap)
+
+    return [{"case": case, "rows": len(X), "stage": stage, **s}
+            for stage, s in stats.items()]
+
+
+# ===============================
+# Comparison
+# ===============================
+def compare(previous, current, threshold, min_delta=DEFAULT_MIN_DELTA_S,
+            verbose=True):
+    """
+    Prints per (case, rows, stage) wall-time ratios and returns the
+    entries slower than `threshold` x the previous run *and* by at
+    least `min_delta` seconds, so sub-millisecond stages and timer
+    noise on fast ones never fail the gate.
+    """
+    def key(r):
+        return r["case"], r["rows"], r["stage"]
+
+    before = {key(r): r for r in previous["results"]}
+    regressions = []
+
+    if verbose:
+        print(f"\n{'case':<32}{'rows':>9}  {'stage':<16}{'before':>10}{'after':>10}{'ratio':>8}")
+    for r in current["results"]:
+        old = before.get(key(r))
+        if old is None or old["wall_s"] == 0:
+            continue
+        ratio = r["wall_s"] / old["wall_s"]
+        slower = ratio > threshold and r["wall_s"] - old["wall_s"] >= min_delta
+        if verbose:
+            flag = "  <-- regression" if slower else ""
+            print(f"{r['case']:<32}{r['rows']:>9}  {r['stage']:<16}"
+                  f"{old['wall_s']:>10.4f}{r['wall_s']:>10.4f}{ratio:>8.2f}{flag}")
+        if slower:
+            regressions.append({**r, "previous_wall_s": old["wall_s"], "ratio": ratio})
+
+    return regressions
+
+
+def keep_best(results, remeasured):
+    """
+    Folds a second measurement of some cases into `results`, keeping
+    each stage's best time.
+    """
+    index = {(r["case"], r["rows"], r["stage"]): r for r in results}
+    for r in remeasured:
+        old = index.get((r["case"], r["rows"], r["stage"]))
+        if old is not None:
+            old["wall_s"] = min(old["wall_s"], r["wall_s"])
+            old["cpu_s"] = min(old["cpu_s"], r["cpu_s"])
+
+
+# ===============================
+# CLI
+# ===============================
+def environment():
+    import shap
+    import sklearn
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sklearn": sklearn.__version__,
+        "shap": shap.__version__,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Risk engine benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="evaluation rows (X_test is up-scaled); up to 1000000")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help="timed runs per stage; the best one is reported")
+    parser.add_argument("--shap-max-rows", type=int, default=10000,
+                        help="skip SHAP drift above this many rows")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="skip the traced run used for peak memory")
+    parser.add_argument("--no-synthetic", action="store_true",
+                        help="only benchmark the shipped model pairs")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--compare", help="previous JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="wall-time ratio that counts as a regression")
+    parser.add_argument("--min-delta", type=float, default=DEFAULT_MIN_DELTA_S,
+                        help="minimum slowdown in seconds that counts as a regression")
+    args = parser.parse_args(argv)
+
+    # Imports sklearn and shap up front so their import time is not
+    # charged to the first model_load / shap_drift measurement
+    env = environment()
+
+    X_test = load_features("data/test")
+    y_test = load_labels("data/test")
+
+    pairs = [
+        (f"{os.path.basename(a)} vs {os.path.basename(b)}",
+         lambda a=a, b=b: (joblib.load(a), joblib.load(b)))
+        for a, b in SHIPPED_PAIRS
+    ]
+    if not args.no_synthetic:
+        forests = {spec: synthetic_forest(*spec) for spec in SYNTHETIC_FORESTS}
+        pairs += [
+            (f"rf{n}_d{d} vs v0",
+             lambda f=forests[(n, d)]: (joblib.load("models/model_v0.pkl"), f))
+            for n, d in SYNTHETIC_FORESTS
+        ]
+
+    def run_cases(only=None):
+        results = []
+        for n_rows in args.sizes:
+            X, y = upscale(X_test, y_test, n_rows)
+            for case, load in pairs:
+                if only is not None and (case, n_rows) not in only:
+                    continue
+                print(f"[bench] {case} @ {n_rows} rows", file=sys.stderr)
+                results += bench_pair(
+                    case, load, X, y, args.repeat,
+                    with_shap=n_rows <= args.shap_max_rows,
+                    memory=not args.no_memory
+                )
+        return results
+
+    results = run_cases()
+    report = {"environment": env, "results": results}
+
+    status = 0
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+
+        # Cases that look slower are measured once more before they
+        # count: host slowdowns come in bursts, regressions persist
+        slow = {(r["case"], r["rows"]) for r in compare(
+            previous, report, args.threshold, args.min_delta, verbose=False)}
+        if slow:
+            keep_best(results, run_cases(only=slow))
+
+        report["regressions"] = compare(previous, report, args.threshold,
+                                        args.min_delta)
+        status = 1 if report["regressions"] else 0
+    else:
+        print(pd.DataFrame(results).to_string(index=False))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,86 +1,217 @@
+"""
+Trains the model variants. Run from the repository root:
+
+    python -m models.train_models [--jobs N] [--only model_v1 ...]
+"""
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
 import joblib
 import pandas as pd
 import numpy as np
+import sklearn
 from sklearn.ensemble import RandomForestClassifier
 
-# =========================
-# LOAD DATA
-# =========================
-X_train = joblib.load("data/X_train.pkl")
-X_test = joblib.load("data/X_test.pkl")
-y_train = joblib.load("data/y_train.pkl")
-y_test = joblib.load("data/y_test.pkl")
+from analysis.dataset_store import load_features, load_labels
+from analysis.summary_cache import dataset_fingerprint
+
+MANIFEST = "manifest.json"
 
 # =========================
-# CREATE SUBGROUPS
+# VARIANT SPECS
+# Each variant is a chain of data transforms plus forest
+# hyperparameters. Every random step takes its own seed, so
+# rebuilding a spec always produces the same model.
 # =========================
-def add_subgroups(X, y, feature):
-    df = X.copy()
-    df["target"] = y.values
-    df["group"] = pd.qcut(df[feature], 3, labels=["Low", "Medium", "High"])
-    return df
+VARIANTS = {
+    # Baseline (deployed)
+    "model_v0": {
+        "transforms": [],
+        "params": {"n_estimators": 120, "max_depth": None, "random_state": 0},
+    },
+    # Small change: slightly different depth, small noise injection
+    "model_v1": {
+        "transforms": [["gaussian_noise", {"scale": 0.02, "seed": 1}]],
+        "params": {"n_estimators": 120, "max_depth": 10, "random_state": 1},
+    },
+    # Moderate bias: trained without the largest tumours
+    "model_v2": {
+        "transforms": [["drop_group", {"feature": "mean radius", "group": "High"}]],
+        "params": {"n_estimators": 100, "max_depth": 8, "random_state": 2},
+    },
+    # Severe bias: no small tumours and 25% flipped labels
+    "model_v3": {
+        "transforms": [
+            ["drop_group", {"feature": "mean radius", "group": "Low"}],
+            ["flip_labels", {"frac": 0.25, "seed": 42}],
+        ],
+        "params": {"n_estimators": 60, "max_depth": 4, "random_state": 3},
+    },
+}
 
-df_train = add_subgroups(X_train, y_train, "mean radius")
 
 # =========================
-# BASELINE MODEL v0 (DEPLOYED)
+# DATA TRANSFORMS
 # =========================
-model_v0 = RandomForestClassifier(
-    n_estimators=120,
-    max_depth=None,
-    random_state=0
-)
-model_v0.fit(X_train, y_train)
-joblib.dump(model_v0, "models/model_v0.pkl")
+def gaussian_noise(X, y, scale, seed):
+    rng = np.random.default_rng(seed)
+    return X + rng.normal(0, scale, X.shape), y
+
+
+def drop_group(X, y, feature, group):
+    groups = pd.qcut(X[feature], 3, labels=["Low", "Medium", "High"])
+    keep = (groups != group).to_numpy()
+    return X[keep], y[keep]
+
+
+def flip_labels(X, y, frac, seed):
+    y = y.copy()
+    idx = y.sample(frac=frac, random_state=seed).index
+    y.loc[idx] = 1 - y.loc[idx]
+    return X, y
+
+
+TRANSFORMS = {
+    "gaussian_noise": gaussian_noise,
+    "drop_group": drop_group,
+    "flip_labels": flip_labels,
+}
 
-# =========================
-# UPDATED MODEL v1 (SMALL CHANGE)
-# - slightly different depth
-# - small noise injection
-# =========================
-X_v1 = X_train.copy()
-noise = np.random.normal(0, 0.02, X_v1.shape)
-X_v1 = X_v1 + noise
-
-model_v1 = RandomForestClassifier(
-    n_estimators=120,
-    max_depth=10,
-    random_state=1
-)
-model_v1.fit(X_v1, y_train)
-joblib.dump(model_v1, "models/model_v1.pkl")
 
 # =========================
-# UPDATED MODEL v2 (MODERATE BIAS)
+# FINGERPRINTS
 # =========================
-df_v2 = df_train[df_train["group"] != "High"]
-X_v2 = df_v2.drop(columns=["target", "group"])
-y_v2 = df_v2["target"]
-
-model_v2 = RandomForestClassifier(
-    n_estimators=100,
-    max_depth=8,
-    random_state=2
-)
-model_v2.fit(X_v2, y_v2)
-joblib.dump(model_v2, "models/model_v2.pkl")
+def spec_fingerprint(spec):
+    payload = json.dumps({"spec": spec, "sklearn": sklearn.__version__}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def data_fingerprint(X, y):
+    # Features hashed the same way as the analysis caches, plus the labels
+    h = hashlib.sha256(dataset_fingerprint(X).encode())
+    h.update(pd.util.hash_pandas_object(y, index=True).to_numpy().tobytes())
+    return h.hexdigest()[:32]
+
+
+def load_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def atomic_write(path, write):
+    """
+    Writes through a temp file in the target directory and renames
+    it into place, so readers never see a half-written artifact.
+    """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
 
 # =========================
-# UPDATED MODEL v3 (SEVERE BIAS)
+# TRAINING
 # =========================
-df_v3 = df_train[df_train["group"] != "Low"].copy()
-noise_idx = df_v3.sample(frac=0.25, random_state=42).index
-df_v3.loc[noise_idx, "target"] = 1 - df_v3.loc[noise_idx, "target"]
-
-X_v3 = df_v3.drop(columns=["target", "group"])
-y_v3 = df_v3["target"]
-
-model_v3 = RandomForestClassifier(
-    n_estimators=60,
-    max_depth=4,
-    random_state=3
-)
-model_v3.fit(X_v3, y_v3)
-joblib.dump(model_v3, "models/model_v3.pkl")
-
-print("✅ v0, v1, v2, v3 models trained successfully")
+_DATA = {}
+
+
+def _init_worker(X_train, y_train):
+    _DATA["X"] = X_train
+    _DATA["y"] = y_train
+
+
+def train_variant(name, spec, output_dir):
+    X, y = _DATA["X"], _DATA["y"]
+    for transform, kwargs in spec["transforms"]:
+        X, y = TRANSFORMS[transform](X, y, **kwargs)
+
+    # One core per forest: parallelism comes from training variants side by side
+    model = RandomForestClassifier(**spec["params"], n_jobs=1)
+    model.fit(X, y)
+    model.n_jobs = None
+
+    path = os.path.join(output_dir, f"{name}.pkl")
+    atomic_write(path, lambda f: joblib.dump(model, f))
+    return name, path
+
+
+def train_variants(X_train, y_train, variants=VARIANTS, output_dir="models",
+                   n_jobs=None, force=False):
+    """
+    Trains every variant whose spec or training data changed since
+    the last build, n_jobs variants at a time.
+
+    Returns {name: "trained" | "unchanged"}.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = load_manifest(output_dir)
+    data_hash = data_fingerprint(X_train, y_train)
+
+    status, todo = {}, {}
+    for name, spec in variants.items():
+        entry = {"spec": spec_fingerprint(spec), "data": data_hash}
+        built = manifest.get(name)
+        if (not force and built is not None
+                and {k: built.get(k) for k in entry} == entry
+                and os.path.exists(os.path.join(output_dir, f"{name}.pkl"))):
+            status[name] = "unchanged"
+        else:
+            todo[name] = entry
+
+    if todo:
+        with ProcessPoolExecutor(max_workers=min(n_jobs or os.cpu_count(), len(todo)),
+                                 initializer=_init_worker,
+                                 initargs=(X_train, y_train)) as pool:
+            futures = [pool.submit(train_variant, name, variants[name], output_dir)
+                       for name in todo]
+            for future in futures:
+                name, _ = future.result()
+                manifest[name] = todo[name]
+                status[name] = "trained"
+
+        atomic_write(os.path.join(output_dir, MANIFEST),
+                     lambda f: f.write(json.dumps(manifest, indent=2, sort_keys=True).encode()))
+
+    return status
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the model variants")
+    parser.add_argument("--output-dir", default="models")
+    parser.add_argument("--X-train", default="data/train")
+    parser.add_argument("--y-train", default="data/train")
+    parser.add_argument("--jobs", type=int, default=None)
+    parser.add_argument("--only", nargs="+", choices=sorted(VARIANTS),
+                        help="train just these variants")
+    parser.add_argument("--force", action="store_true",
+                        help="retrain even if nothing changed")
+    args = parser.parse_args(argv)
+
+    # =========================
+    # LOAD DATA
+    # =========================
+    X_train = load_features(args.X_train)
+    y_train = load_labels(args.y_train)
+
+    variants = {name: VARIANTS[name] for name in (args.only or VARIANTS)}
+    status = train_variants(X_train, y_train, variants, args.output_dir,
+                            n_jobs=args.jobs, force=args.force)
+
+    for name, state in status.items():
+        print(f"{name}: {state}")
+    print(f"✅ {len(variants)} models ready in {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,7 @@
 import streamlit as st
-import joblib
 
-from analysis.compute_metrics import compute_metrics
-from analysis.subgroup_risk import compute_subgroup_risk
-from analysis.bias_severity import compute_bias_severity
+from analysis.jobs import RISK_JOBS, leave_session_job, retry_session_job, session_job
+from analysis.result_cache import APP_REPORT_OPTIONS, cached_risk_report, risk_cache_key
 
 st.set_page_config(page_title="Risk Results", layout="centered")
 
@@ -14,45 +12,62 @@ if "baseline_path" not in st.session_state or "updated_path" not in st.session_s
     st.error("No models found. Please go back and upload models.")
     st.stop()
 
-# Load models
-baseline_model = joblib.load(st.session_state["baseline_path"])
-updated_model = joblib.load(st.session_state["updated_path"])
-
-# Load dataset
-X_test = joblib.load("data/X_test.pkl")
-y_test = joblib.load("data/y_test.pkl")
-
 # =========================
 # Compute Metrics
 # =========================
-flip_rate, conf_shift, feature_drift = compute_metrics(
-    baseline_model,
-    updated_model,
-    X_test
+# Same options and job key as app.py's analysis, so this page joins
+# a review that is still running (or is served from the shared cache)
+# instead of computing it on the script thread
+baseline_path = st.session_state["baseline_path"]
+updated_path = st.session_state["updated_path"]
+drift_mode = st.session_state.get("drift_mode", "exact")
+
+job = session_job(
+    st.session_state,
+    RISK_JOBS,
+    risk_cache_key(baseline_path, updated_path, drift_mode=drift_mode,
+                   **APP_REPORT_OPTIONS),
+    lambda profiler: cached_risk_report(
+        baseline_path,
+        updated_path,
+        drift_mode=drift_mode,
+        profiler=profiler,
+        **APP_REPORT_OPTIONS
+    )
 )
 
-subgroup_risk = compute_subgroup_risk(
-    baseline_model,
-    updated_model,
-    X_test,
-    y_test,
-    feature="mean radius"
-)
+if job is not None and not job.done:
+    @st.fragment(run_every=1)
+    def poll():
+        if job.done:
+            st.rerun()
+        progress = job.progress()
+        st.info(f"🔄 Running analysis: {progress['stage'] or progress['status']}")
+        if st.button("✖ Cancel Analysis"):
+            leave_session_job(st.session_state, RISK_JOBS, cancelled=True)
+            st.rerun()
+
+    poll()
+    st.stop()
 
-bias_severity = compute_bias_severity(
-    updated_model,
-    X_test,
-    y_test,
-    feature="mean radius"
-)
+if job is None or job.status != "done":
+    if job is None or job.status == "cancelled":
+        st.warning("✖ Analysis cancelled.")
+    else:
+        st.error(f"❌ Error computing risk: {job.error}")
+    if st.button("🔁 Retry Analysis"):
+        retry_session_job(st.session_state, RISK_JOBS)
+        st.rerun()
+    st.stop()
 
-final_risk_score = (
-    0.30 * flip_rate +
-    0.25 * conf_shift +
-    0.20 * feature_drift +
-    0.15 * subgroup_risk +
-    0.10 * bias_severity
-)
+report = job.result
+
+flip_rate = report["flip_rate"]
+conf_shift = report["conf_shift"]
+feature_drift = report["feature_drift"]
+subgroup_risk = report["subgroup_risk"]
+bias_severity = report["bias_severity"]
+final_risk_score = report["final_risk_score"]
 
 # =========================
 # Display Results
@@ -61,7 +76,7 @@ st.subheader("Risk Components")
 
 st.metric("Prediction Flip Rate", round(flip_rate, 3))
 st.metric("Confidence Shift", round(conf_shift, 3))
-st.metric("Feature Drift", round(feature_drift, 6))
+st.metric("Feature Drift", "skipped" if feature_drift is None else round(feature_drift, 6))
 st.metric("Subgroup Risk", round(subgroup_risk, 3))
 st.metric("Bias Severity Score", round(bias_severity, 3))
 
@@ -0,0 +1,43 @@
+import copy
+import json
+
+from benchmarks.bench_risk_engine import DEFAULT_THRESHOLD, compare, main
+
+
+def _run(stages):
+    return {"results": [
+        {"case": "v0 vs v1", "rows": 1000, "stage": stage, "wall_s": wall}
+        for stage, wall in stages.items()
+    ]}
+
+
+def test_compare_with_itself_has_no_regressions():
+    run = _run({"model_load": 0.07, "shap_drift": 1.2, "final_scoring": 3e-5})
+    assert compare(run, copy.deepcopy(run), threshold=DEFAULT_THRESHOLD) == []
+
+
+def test_small_absolute_slowdowns_are_not_regressions():
+    before = _run({"final_scoring": 3e-5, "model_load": 0.070})
+    after = _run({"final_scoring": 9e-5, "model_load": 0.085})
+    assert compare(before, after, threshold=DEFAULT_THRESHOLD) == []
+
+
+def test_large_slowdown_is_a_regression():
+    before = _run({"shap_drift": 1.0})
+    after = _run({"shap_drift": 2.0})
+    regressions = compare(before, after, threshold=DEFAULT_THRESHOLD)
+    assert [r["stage"] for r in regressions] == ["shap_drift"]
+
+
+def test_benchmark_run_against_itself_passes(tmp_path):
+    baseline = tmp_path / "bench.json"
+    args = ["--sizes", "200", "--no-synthetic", "--no-memory", "--repeat", "2"]
+    assert main(args + ["--output", str(baseline)]) == 0
+
+    with open(baseline) as f:
+        run = json.load(f)
+    assert compare(run, copy.deepcopy(run), threshold=DEFAULT_THRESHOLD) == []
+
+    # Gate plumbing only: a fresh run's timings are not reproducible enough
+    # for the default threshold on a shared test host
+    assert main(args + ["--compare", str(baseline), "--threshold", "100"]) == 0
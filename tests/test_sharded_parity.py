@@ -0,0 +1,44 @@
+import pytest
+
+from analysis.dataset_store import load_features, load_labels
+from analysis.model_cache import load_model
+from analysis.risk_pipeline import evaluate_risk
+from analysis.sharded import sharded_risk
+from analysis.streaming import frame_chunks, stream_risk
+
+# Float sums are reduced shard by shard / chunk by chunk instead of in
+# one pass, so they may differ from the in-memory path by rounding only
+COUNT_COMPONENTS = ("flip_rate", "subgroup_risk", "bias_severity")
+FLOAT_COMPONENTS = ("conf_shift", "feature_drift")
+FLOAT_RTOL = 1e-12
+
+
+@pytest.fixture(scope="module")
+def reference():
+    X = load_features("data/test")
+    y = load_labels("data/test")
+    baseline = load_model("models/model_v0.pkl")
+    updated = load_model("models/model_v2.pkl")
+    return baseline, updated, X, y, evaluate_risk(baseline, updated, X, y)
+
+
+def _assert_matches(report, expected):
+    for name in COUNT_COMPONENTS:
+        assert report[name] == expected[name], name
+    for name in (*FLOAT_COMPONENTS, "final_risk_score"):
+        assert report[name] == pytest.approx(expected[name], rel=FLOAT_RTOL, abs=0), name
+    assert report["decision"] == expected["decision"]
+
+
+def test_sharded_risk_matches_in_memory(reference):
+    baseline, updated, X, y, expected = reference
+    report = sharded_risk(baseline, updated, X, y, n_workers=2, shard_rows=50)
+    assert report["rows"] == len(X)
+    _assert_matches(report, expected)
+
+
+def test_stream_risk_matches_in_memory(reference):
+    baseline, updated, X, y, expected = reference
+    report = stream_risk(baseline, updated, frame_chunks(X, y, chunksize=40))
+    assert report["rows"] == len(X)
+    _assert_matches(report, expected)